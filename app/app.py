@@ -1,36 +1,85 @@
+import json
 import logging
 import os
-import subprocess
-import zipfile
+import queue
+import threading
+from collections import namedtuple
+from contextlib import asynccontextmanager
 from pathlib import Path
 import redis
-from fastapi import FastAPI, File, UploadFile, HTTPException, APIRouter
+from fastapi import FastAPI, File, Form, Query, UploadFile, HTTPException, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
-from spire.doc import *
-from spire.doc.common import *
-import re
-# Set up Redis client (use redis.Redis instead of redis.StrictRedis)
-redis_client = redis.Redis(host="172.16.117.47", port=6379, db=0, decode_responses=True, socket_timeout=30)  # Docker Redis service
-
-# Set up logging to Redis
-class RedisHandler(logging.Handler):
-    def emit(self, record):
-        log_entry = self.format(record)
-        try:
-            redis_client.lpush("app_logs", log_entry)  # Push logs to Redis list
-        except redis.exceptions.ConnectionError as e:
-            logging.error(f"Failed to send log to Redis: {e}")  # Handle Redis errors, log them instead of raising exceptions
+from assets import asset_store
+from circuit_breaker import CircuitOpenError, libreoffice_breaker, pdf_text_breaker, spire_breaker
+from compression import choose_encoding, encoded_variants, precompress
+from conversion_executor import bulk_executor, conversion_executor, lanes
+from cost_estimate import estimate_cost, lane_for
+from libreoffice_pool import (
+    LIBREOFFICE_CONVERSIONS,
+    ConversionError,
+    ConversionTimeout,
+    ConverterCrashed,
+    ConverterUnavailable,
+    LIBREOFFICE_PROFILE_ROOT,
+    lo_pool,
+    pdf_page_range_spec,
+)
+from metrics import RequestMetricsMiddleware, conversion_cost, record_stage, registry, set_formats, set_outcome, timed_iter, timed_stage
+from page_ranges import PAGE_RANGE_PATTERN, PREVIEW_MAX_PAGES, format_page_range, parse_page_range, slice_pdf
+from pdf2docx_converter import pdf_text_engine
+from pipeline import PDF2HTML_PIPELINE
+from quarantine import quarantine
+from result_cache import make_cache_key, result_cache
+from single_flight import single_flight
+from spire_pool import SPIRE_HTML_EXPORT_OPTIONS, spire_pool
+from uploads import UPLOAD_MAX_BYTES, UploadSizeLimitMiddleware, save_upload
+from jobs import jobs_router
+from redis_conn import redis_client
+from redis_logging import RedisHandler, read_logs
+from warmup import CONVERSION_WARMUP_REQUIRED, warmup
+from watchdog import OrphanReaper
+from workspaces import workspaces
+from zip_stream import iter_zip, open_zip_stream
+
+# Set up logging to Redis (batched from a background thread started with the app, never blocking the caller)
+redis_log_handler = RedisHandler(redis_client)
 
 # Set up logging configuration
 logging.basicConfig(
     level=logging.DEBUG,
     format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[RedisHandler()]  # Use RedisHandler to log to Redis
+    handlers=[redis_log_handler]  # Use RedisHandler to log to Redis
 )
 
-app = FastAPI()
+# Kills soffice processes left behind by crashed API processes or abandoned one-off runs
+orphan_reaper = OrphanReaper(LIBREOFFICE_PROFILE_ROOT)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Converters start on first use, or ahead of traffic when the warm-up is enabled
+    redis_log_handler.start()
+    orphan_reaper.start()
+    result_cache.load()
+    workspaces.start()
+    asset_store.start()
+    warmup.start()
+    yield
+    asset_store.shutdown()
+    workspaces.shutdown()
+    spire_pool.shutdown()
+    pdf_text_engine.shutdown()
+    conversion_executor.shutdown()
+    bulk_executor.shutdown()
+    lo_pool.shutdown()
+    orphan_reaper.shutdown()
+    redis_log_handler.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS
 app.add_middleware(
@@ -41,10 +90,191 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Directory for uploaded files
-BASE_UPLOAD_DIR = Path("uploads")
-BASE_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-logging.info("Upload directory initialized at: %s", BASE_UPLOAD_DIR)
+# Batch request limits: files per request, and bytes for the whole request body
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "500"))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", str(BATCH_MAX_FILES * UPLOAD_MAX_BYTES)))
+
+# Refuse oversized uploads before their body is read (each batch file is still held to UPLOAD_MAX_BYTES by save_upload)
+app.add_middleware(UploadSizeLimitMiddleware, path_limits={"/api/v1/convert/batch/": BATCH_MAX_BYTES})
+
+# Request id, Server-Timing header and per-stage metrics (outermost, so rejected requests are counted too)
+app.add_middleware(RequestMetricsMiddleware)
+
+# Gauges read when /metrics is scraped
+registry.gauge(
+    "conversions_in_flight", "Conversions running on a worker thread, by lane.",
+    lambda: {(name,): executor.in_flight for name, executor in lanes.items()}, ["lane"],
+)
+registry.gauge(
+    "conversions_queued", "Conversions admitted and waiting for a worker thread, by lane.",
+    lambda: {(name,): executor.queued for name, executor in lanes.items()}, ["lane"],
+)
+registry.gauge("libreoffice_idle_workers", "Warm LibreOffice instances waiting for a job.", lambda: lo_pool.idle_workers)
+registry.gauge("result_cache_bytes", "Bytes held by the conversion result cache.", lambda: result_cache.stats()["bytes"])
+registry.gauge("single_flight_conversions", "Conversions this process runs with identical requests attached.", lambda: single_flight.in_flight)
+registry.gauge(
+    "converter_circuit_open", "1 while a converter's circuit breaker refuses conversions.",
+    lambda: {(breaker.name,): int(breaker.is_open) for breaker in (libreoffice_breaker, spire_breaker, pdf_text_breaker)},
+    ["converter"],
+)
+
+def unpin_after(response, cache_key):
+    # The cache entry was pinned by result_cache.get(pin=True): let it be evicted once the response is sent
+    response.background = BackgroundTask(result_cache.unpin, cache_key)
+    return response
+
+
+def cached_file_response(cache_key, media_type, filename):
+    # Serve a previous conversion of the same bytes and options without touching the converter
+    cached_files = result_cache.get(cache_key, pin=True)
+    if not cached_files:
+        return None
+    logging.debug("Serving cached conversion result: %s", cached_files[0])
+    set_outcome("cache_hit")
+    return unpin_after(FileResponse(
+        path=cached_files[0],
+        media_type=media_type,
+        filename=filename,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    ), cache_key)
+
+# A conversion ready to run: the upload, the lane executor its cost picked and the client it counts against
+ConversionJob = namedtuple("ConversionJob", ["upload", "executor", "client"])
+
+
+def client_id(request):
+    # Identity used for the per-client share of a lane: the caller's X-Client-ID, else its address
+    client = request.headers.get("x-client-id") or (request.client.host if request.client else "unknown")
+    return client[:128]
+
+
+async def schedule(upload, request, page_range=None):
+    # Pick the lane from the estimated cost, so small documents never queue behind huge ones
+    with timed_stage("estimate"):
+        cost = await run_in_threadpool(
+            estimate_cost, upload.path, upload.kind, parse_page_range(page_range) if page_range else None
+        )
+    lane = lane_for(cost)
+    conversion_cost.observe(cost.score, lane=lane)
+    logging.debug("Estimated cost %s (%s bytes, %s pages, %s images): %s lane", cost.score, cost.size, cost.pages, cost.images, lane)
+    return ConversionJob(upload, lanes[lane], client_id(request))
+
+
+async def run_conversion(job, breaker, fn, *args, **kwargs):
+    # Run a conversion on its lane, unless the document is quarantined or the converter's circuit is open
+    upload = job.upload
+    if await run_in_threadpool(quarantine.is_quarantined, upload.sha256):
+        raise HTTPException(status_code=422, detail="This document repeatedly timed out during conversion and is quarantined.")
+    try:
+        breaker.before_call()
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    try:
+        result = await job.executor.run(fn, *args, client=job.client, **kwargs)
+    except ConversionTimeout as e:
+        breaker.record_failure()
+        await run_in_threadpool(quarantine.record_timeout, upload.sha256)
+        raise HTTPException(status_code=504, detail=f"Conversion timed out: {e}")
+    except ConverterUnavailable as e:
+        breaker.release()  # Every instance was busy, none failed
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(job.executor.retry_after)})
+    except ConverterCrashed:
+        breaker.record_failure()
+        raise
+    except ConversionError:
+        breaker.record_success()  # The converter is fine, the document was not
+        raise
+    except BaseException:
+        breaker.release()  # Never reached the converter, e.g. rejected as busy
+        raise
+    breaker.record_success()
+    return result
+
+def requested_page_range(pages, preview):
+    # Page selection from ?pages=1-3,5 or ?preview=N (the first N pages), in canonical form; None means all pages
+    if pages and preview:
+        raise HTTPException(status_code=400, detail="Use either pages or preview, not both.")
+    if preview:
+        return format_page_range([(1, preview)])
+    if pages:
+        try:
+            return format_page_range(parse_page_range(pages))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return None
+
+
+async def slice_pdf_upload(file_path, page_range):
+    # Hand the converter a PDF holding only the requested pages, so its work scales with them
+    sliced_path = file_path.parent / "pages" / file_path.name
+    sliced_path.parent.mkdir()
+    with timed_stage("slice"):
+        try:
+            kept = await run_in_threadpool(slice_pdf, file_path, sliced_path, parse_page_range(page_range))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    logging.debug("Kept %s pages (%s) of %s", kept, page_range, file_path)
+    return sliced_path
+
+
+def with_page_range(export_options, page_range):
+    # Cache key options: a page range or preview is its own entry, next to the full conversion
+    return f"{export_options}|pages={page_range}" if page_range else export_options
+
+
+# ?images=: "embedded" keeps the converter's base64 images, "external" moves them to /assets/ files
+IMAGES_MODE_PATTERN = "^(embedded|external)$"
+# Asset names are content hashes, so a URL always serves the same bytes
+ASSET_HEADERS = {
+    "Cache-Control": "public, max-age=31536000, immutable",
+    "X-Content-Type-Options": "nosniff",
+    "Content-Security-Policy": "default-src 'none'; style-src 'unsafe-inline'",  # Images may be user-supplied SVG
+}
+
+
+def with_images(export_options, images):
+    # Cache key options: externalized images are their own entry
+    return f"{export_options}|images=external" if images == "external" else export_options
+
+
+async def externalize_images(html_files, images):
+    # Replace base64 images by URLs of shared, content-hashed asset files
+    if images != "external":
+        return
+    with timed_stage("assets"):
+        for html_file in html_files:
+            await run_in_threadpool(asset_store.externalize, html_file)
+
+
+async def finish_html(html_file_path, images):
+    # Output files of an HTML conversion: the page (images externalized if asked) plus its precompressed variants
+    await externalize_images([html_file_path], images)
+    with timed_stage("compress"):
+        variants = await run_in_threadpool(precompress, html_file_path)
+    return [html_file_path, *variants]
+
+
+def html_file_response(files, filename, request):
+    # Send the precompressed variant the client accepts best, the plain page otherwise
+    html_file_path, variants = encoded_variants(files)
+    encoding = choose_encoding(request.headers.get("accept-encoding"), variants)
+    headers = {"Content-Disposition": f"attachment; filename={filename}", "Vary": "Accept-Encoding"}
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return FileResponse(
+        path=variants.get(encoding, html_file_path), media_type="text/html", filename=filename, headers=headers
+    )
+
+
+def cached_html_response(cache_key, filename, request):
+    # Cached HTML conversion, negotiated like a fresh one
+    cached_files = result_cache.get(cache_key, pin=True)
+    if not cached_files:
+        return None
+    logging.debug("Serving cached conversion result: %s", cached_files[0])
+    set_outcome("cache_hit")
+    return unpin_after(html_file_response(cached_files, filename, request), cache_key)
 
 # Create a new APIRouter for the conversion-related routes (version 1)
 convert_router_v1 = APIRouter(prefix="/api/v1/convert", tags=["convert-v1"])
@@ -55,10 +285,34 @@ async def root_v1():
     logging.debug("Base route for v1 accessed.")
     return {"message": "Welcome to the FastAPI file upload and conversion service! (v1)"}
 
+# Output types kept in the docx2html archive
+DOCX2HTML_OUTPUT_SUFFIXES = [".html", ".gif", ".png"]
+# Name the docx2html source is converted under, so cached outputs never carry a client's file name
+DOCX2HTML_SOURCE_STEM = "document"
+
+def zip_member_name(path, stem):
+    # The page is named after this request's upload; images keep the neutral names the page refers to
+    return f"{stem}{path.suffix}" if path.suffix.lower() == ".html" else path.name
+
+def zip_stream_response(files, stem):
+    # Stream the archive as it is built; images are stored as-is, HTML is deflated
+    logging.debug("Streaming zip of %s files.", len(files))
+    return StreamingResponse(
+        timed_iter(iter_zip((path, zip_member_name(path, stem)) for path in files), "zip"),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=converted_files.zip"},
+    )
+
+
 # File upload route under /api/v1/convert/upload-docx/
 @convert_router_v1.post("/docx2html/")
-async def upload_docx_v1(file: UploadFile = File(...)):
+async def upload_docx_v1(
+    request: Request,
+    file: UploadFile = File(...),
+    images: str = Query("embedded", pattern=IMAGES_MODE_PATTERN),
+):
     logging.debug("Received file upload request for v1.")
+    set_formats("docx", "html")
     
     # Validate MIME type for DOCX
     if file.content_type not in [
@@ -70,74 +324,71 @@ async def upload_docx_v1(file: UploadFile = File(...)):
             status_code=400, detail="Invalid file type. Please upload a DOCX file."
         )
 
+    # Scratch directory of this request only, so uploads sharing a file name cannot clash
+    workspace = workspaces.workspace()
     try:
         # Define paths
-        file_name_without_ext = file.filename.rsplit(".", 1)[0]
-        target_folder = BASE_UPLOAD_DIR / file_name_without_ext
-        target_folder.mkdir(parents=True, exist_ok=True)
-        logging.debug("Target folder created at: %s", target_folder)
+        file_name_without_ext = Path(file.filename).stem
+        target_folder = workspace.path
+        logging.debug("Workspace created at: %s", target_folder)
 
         # Save uploaded file
-        file_path = target_folder / file.filename
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+        suffix = ".doc" if Path(file.filename).suffix.lower() == ".doc" else ".docx"
+        file_path = target_folder / f"{DOCX2HTML_SOURCE_STEM}{suffix}"
+        upload = await save_upload(file, file_path, allowed_kinds=("docx", "doc"))
         logging.debug("Saved uploaded file to: %s", file_path)
 
-        # Run LibreOffice conversion
-        logging.debug("Running LibreOffice conversion...")
-        subprocess.run(
-            [
-                "libreoffice",
-                "--headless",               # Run LibreOffice without its GUI
-                "--convert-to",             # Specify the conversion type
-                "html:HTML:EmbedImages",    # Convert to HTML with embedded images "html:HTML:EmbedImages"
-                "--outdir", str(target_folder),  # Specify the target folder for the output
-                str(file_path),             # Path to the file you want to convert
-            ],
-            check=True,  # Ensure the command raises an error if it fails
-        )
-        logging.debug("LibreOffice conversion completed successfully.")
-
-        # Zip the valid converted files
-        zip_file_path = target_folder / "converted_files.zip"
-        with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_in_dir in target_folder.iterdir():
-                if file_in_dir.suffix.lower() in [".html", ".gif", ".png"]:
-                    zipf.write(file_in_dir, arcname=file_in_dir.name)
-                    logging.debug("Adding file to zip: %s", file_in_dir)
-
-        logging.debug("ZIP file created at: %s", zip_file_path)
-
-        # Send the file to the client
-        response = FileResponse(
-            path=zip_file_path,
-            media_type="application/zip",
-            filename="converted_files.zip",
-            headers={"Content-Disposition": "attachment; filename=converted_files.zip"}
-        )
-
-        # response = FileResponse(
-        #     path=zip_file_path,
-        #     media_type="application/html",
-        #     filename=f"{file_name_without_ext}.html",
-        #     headers={"Content-Disposition": f"attachment; filename={file_name_without_ext}.html"}
-        # )
+        cache_key = make_cache_key(upload.sha256, "html+images", with_images(f"libreoffice:html:HTML:EmbedImages|source={DOCX2HTML_SOURCE_STEM}", images))
+        cached_files = result_cache.get(cache_key, pin=True)
+        if cached_files:
+            logging.debug("Serving cached conversion result for: %s", file_path)
+            set_outcome("cache_hit")
+            return unpin_after(zip_stream_response(cached_files, file_name_without_ext), cache_key)
+
+        async def produce():
+            # Run LibreOffice conversion into a folder of its own so only the outputs end up in the zip
+            output_folder = target_folder / "output"
+            output_folder.mkdir()
+            logging.debug("Running LibreOffice conversion...")
+            job = await schedule(upload, request)
+            await run_conversion(job, libreoffice_breaker, lo_pool.convert, file_path, output_folder, "html:HTML:EmbedImages")
+            logging.debug("LibreOffice conversion completed successfully.")
+
+            output_files = sorted(f for f in output_folder.iterdir() if f.suffix.lower() in DOCX2HTML_OUTPUT_SUFFIXES)
+            await externalize_images([f for f in output_files if f.suffix.lower() == ".html"], images)
+            with timed_stage("cache_store"):
+                return await run_in_threadpool(result_cache.put, cache_key, output_files)
+
+        # Identical uploads converting right now share this conversion
+        output_files = await single_flight.run(cache_key, produce)
+
+        # Send the zip to the client while it is being built
         logging.debug("Sending response to client.")
+        return workspace.cleanup_after(zip_stream_response(output_files, file_name_without_ext))
 
-        return response
-
-    except subprocess.CalledProcessError as e:
+    except HTTPException:
+        raise
+    except ConversionError as e:
         logging.error("LibreOffice conversion failed with error: %s", e)
         raise HTTPException(status_code=500, detail=f"LibreOffice conversion failed: {e}")
     except Exception as e:
         logging.error("Unexpected error occurred: %s", e)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+    finally:
+        workspace.close()  # Only removes the workspace when no response took it over
 
 
 # File upload route under /api/v1/convert/upload-docx-to-pdf/
 @convert_router_v1.post("/docx2pdf/")
-async def upload_docx_to_pdf_v1(file: UploadFile = File(...)):
+async def upload_docx_to_pdf_v1(
+    request: Request,
+    file: UploadFile = File(...),
+    pages: str | None = Query(None, pattern=PAGE_RANGE_PATTERN),  # e.g. "1-3,5"
+    preview: int | None = Query(None, ge=1, le=PREVIEW_MAX_PAGES),  # Only the first N pages
+):
     logging.debug("Received DOCX to PDF conversion request.")
+    set_formats("docx", "pdf")
+    page_range = requested_page_range(pages, preview)
     
     # Validate MIME type for DOCX
     if file.content_type != "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
@@ -146,36 +397,39 @@ async def upload_docx_to_pdf_v1(file: UploadFile = File(...)):
             status_code=400, detail="Invalid file type. Please upload a DOCX file."
         )
 
+    # Scratch directory of this request only, so uploads sharing a file name cannot clash
+    workspace = workspaces.workspace()
     try:
         # Define paths
-        file_name_without_ext = file.filename.rsplit(".", 1)[0]
-        target_folder = BASE_UPLOAD_DIR / file_name_without_ext
-        target_folder.mkdir(parents=True, exist_ok=True)
-        logging.debug("Target folder created at: %s", target_folder)
+        file_name_without_ext = Path(file.filename).stem
+        target_folder = workspace.path
+        logging.debug("Workspace created at: %s", target_folder)
 
         # Save uploaded file
-        file_path = target_folder / file.filename
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+        file_path = target_folder / Path(file.filename).name
+        upload = await save_upload(file, file_path, allowed_kinds=("docx",))
         logging.debug("Saved uploaded file to: %s", file_path)
 
-        # Run LibreOffice conversion (DOCX to PDF)
-        logging.debug("Running LibreOffice conversion from DOCX to PDF...")
-        subprocess.run(
-            [
-                "libreoffice",
-                "--headless",              # Run LibreOffice without its GUI
-                "--convert-to",            # Specify the conversion type
-                "pdf",                     # Convert to PDF
-                "--outdir", str(target_folder),  # Specify the output directory
-                str(file_path),            # Path to the DOCX file
-            ],
-            check=True,  # Ensure the command raises an error if it fails
-        )
-        logging.debug("LibreOffice conversion to PDF completed successfully.")
-        file_name = f"{file_name_without_ext}.pdf"
-        # Get the converted PDF file path
-        pdf_file_path = target_folder / file_name
+        cache_key = make_cache_key(upload.sha256, "pdf", with_page_range("libreoffice:pdf", page_range))
+        cached_response = cached_file_response(cache_key, "application/pdf", f"{file_name_without_ext}.pdf")
+        if cached_response:
+            return cached_response
+
+        async def produce():
+            # Run LibreOffice conversion (DOCX to PDF), exporting only the requested pages
+            logging.debug("Running LibreOffice conversion from DOCX to PDF...")
+            convert_to = pdf_page_range_spec(page_range) if page_range else "pdf"
+            job = await schedule(upload, request, page_range)
+            await run_conversion(job, libreoffice_breaker, lo_pool.convert, file_path, target_folder, convert_to)
+            logging.debug("LibreOffice conversion to PDF completed successfully.")
+            file_name = f"{file_name_without_ext}.pdf"
+            # Get the converted PDF file path
+            pdf_file_path = target_folder / file_name
+            with timed_stage("cache_store"):
+                return await run_in_threadpool(result_cache.put, cache_key, [pdf_file_path])
+
+        # Identical uploads converting right now share this conversion
+        pdf_file_path = (await single_flight.run(cache_key, produce))[0]
         
         # Send the PDF file as a response
         response = FileResponse(
@@ -185,19 +439,31 @@ async def upload_docx_to_pdf_v1(file: UploadFile = File(...)):
             headers={"Content-Disposition": f"attachment; filename={file_name_without_ext}.pdf"}
         )
         logging.debug("Sending PDF response to client.")
-        return response
+        return workspace.cleanup_after(response)
 
-    except subprocess.CalledProcessError as e:
+    except HTTPException:
+        raise
+    except ConversionError as e:
         logging.error("LibreOffice conversion failed with error: %s", e)
         raise HTTPException(status_code=500, detail=f"LibreOffice conversion failed: {e}")
     except Exception as e:
         logging.error("Unexpected error occurred: %s", e)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+    finally:
+        workspace.close()  # Only removes the workspace when no response took it over
 
 # File upload route under /api/v1/convert/upload-pdf-to-docx/
 @convert_router_v1.post("/pdf2docx/")
-async def upload_pdf_to_docx_v1(file: UploadFile = File(...)):
-    logging.debug("Received PDF to DOCX conversion request.")
+async def upload_pdf_to_docx_v1(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: str = Query("layout", pattern="^(layout|text)$"),  # "text": fast text-only extraction, no LibreOffice
+    pages: str | None = Query(None, pattern=PAGE_RANGE_PATTERN),  # e.g. "1-3,5"
+    preview: int | None = Query(None, ge=1, le=PREVIEW_MAX_PAGES),  # Only the first N pages
+):
+    logging.debug("Received PDF to DOCX conversion request (%s mode).", mode)
+    set_formats("pdf", "docx" if mode == "layout" else "docx-text")
+    page_range = requested_page_range(pages, preview)
     
     # Validate MIME type for PDF
     if file.content_type != "application/pdf":
@@ -206,36 +472,47 @@ async def upload_pdf_to_docx_v1(file: UploadFile = File(...)):
             status_code=400, detail="Invalid file type. Please upload a PDF file."
         )
 
+    # Scratch directory of this request only, so uploads sharing a file name cannot clash
+    workspace = workspaces.workspace()
     try:
         # Define paths
-        file_name_without_ext = file.filename.rsplit(".", 1)[0]
-        target_folder = BASE_UPLOAD_DIR / file_name_without_ext
-        target_folder.mkdir(parents=True, exist_ok=True)
-        logging.debug("Target folder created at: %s", target_folder)
+        file_name_without_ext = Path(file.filename).stem
+        target_folder = workspace.path
+        logging.debug("Workspace created at: %s", target_folder)
 
         # Save uploaded file
-        file_path = target_folder / file.filename
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+        file_path = target_folder / Path(file.filename).name
+        upload = await save_upload(file, file_path, allowed_kinds=("pdf",))
         logging.debug("Saved uploaded file to: %s", file_path)
+
+        export_options = "libreoffice:docx" if mode == "layout" else "pdf-text"
+        cache_key = make_cache_key(upload.sha256, "docx", with_page_range(export_options, page_range))
+        cached_response = cached_file_response(cache_key, "application/vnd.openxmlformats-officedocument.wordprocessingml.document", f"{file_name_without_ext}.docx")
+        if cached_response:
+            return cached_response
         print("target_folder :", target_folder)
-        # Run LibreOffice conversion (PDF to DOCX)
-        logging.debug("Running LibreOffice conversion from PDF to DOCX...")
-        subprocess.run(
-            [
-                "libreoffice",
-                "--headless",              # Run LibreOffice without its GUI
-                "--convert-to",            # Specify the conversion type
-                "docx",                    # Convert to DOCX
-                "--outdir", str(target_folder),  # Specify the output directory
-                str(file_path),            # Path to the PDF file
-            ],
-            check=True,  # Ensure the command raises an error if it fails
-        )
-        logging.debug("LibreOffice conversion to DOCX completed successfully.")
-        file_name = f"{file_name_without_ext}.docx"
-        # Get the converted DOCX file path
-        docx_file_path = target_folder / file_name
+
+        async def produce():
+            job = await schedule(upload, request, page_range)
+            source_path = await slice_pdf_upload(file_path, page_range) if page_range else file_path
+            file_name = f"{file_name_without_ext}.docx"
+            # Get the converted DOCX file path
+            docx_file_path = target_folder / file_name
+            if mode == "text":
+                # Extract the page text in parallel chunks, without the layout LibreOffice reconstructs
+                logging.debug("Running text-only PDF to DOCX extraction...")
+                await run_conversion(job, pdf_text_breaker, pdf_text_engine.convert, source_path, docx_file_path)
+                logging.debug("Text-only PDF to DOCX extraction completed successfully.")
+            else:
+                # Run LibreOffice conversion (PDF to DOCX)
+                logging.debug("Running LibreOffice conversion from PDF to DOCX...")
+                await run_conversion(job, libreoffice_breaker, lo_pool.convert, source_path, target_folder, "docx")
+                logging.debug("LibreOffice conversion to DOCX completed successfully.")
+            with timed_stage("cache_store"):
+                return await run_in_threadpool(result_cache.put, cache_key, [docx_file_path])
+
+        # Identical uploads converting right now share this conversion
+        docx_file_path = (await single_flight.run(cache_key, produce))[0]
         
         # Send the DOCX file as a response
         response = FileResponse(
@@ -245,20 +522,31 @@ async def upload_pdf_to_docx_v1(file: UploadFile = File(...)):
             headers={"Content-Disposition": f"attachment; filename={file_name_without_ext}.docx"}
         )
         logging.debug("Sending DOCX response to client.")
-        return response
+        return workspace.cleanup_after(response)
 
-    except subprocess.CalledProcessError as e:
-        logging.error("LibreOffice conversion failed with error: %s", e)
-        raise HTTPException(status_code=500, detail=f"LibreOffice conversion failed: {e}")
+    except HTTPException:
+        raise
+    except ConversionError as e:
+        logging.error("PDF to DOCX conversion failed with error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Conversion failed: {e}")
     except Exception as e:
         logging.error("Unexpected error occurred: %s", e)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+    finally:
+        workspace.close()  # Only removes the workspace when no response took it over
 
 # File upload route under /api/v1/convert/upload-pdf-to-html/
-# File upload route under /api/v1/convert/upload-pdf-to-docx-to-html/
 @convert_router_v1.post("/pdf2html/")
-async def upload_pdf_to_docx_to_html_v1(file: UploadFile = File(...)):
-    logging.debug("Received PDF to DOCX to HTML conversion request.")
+async def upload_pdf_to_docx_to_html_v1(
+    request: Request,
+    file: UploadFile = File(...),
+    pages: str | None = Query(None, pattern=PAGE_RANGE_PATTERN),  # e.g. "1-3,5"
+    preview: int | None = Query(None, ge=1, le=PREVIEW_MAX_PAGES),  # Only the first N pages
+    images: str = Query("embedded", pattern=IMAGES_MODE_PATTERN),
+):
+    logging.debug("Received PDF to HTML conversion request.")
+    set_formats("pdf", "html")
+    page_range = requested_page_range(pages, preview)
     
     # Validate MIME type for PDF
     if file.content_type != "application/pdf":
@@ -267,74 +555,210 @@ async def upload_pdf_to_docx_to_html_v1(file: UploadFile = File(...)):
             status_code=400, detail="Invalid file type. Please upload a PDF file."
         )
 
+    # Scratch directory of this request only, so uploads sharing a file name cannot clash
+    workspace = workspaces.workspace()
     try:
         # Define paths
-        file_name_without_ext = file.filename.rsplit(".", 1)[0]
-        target_folder = BASE_UPLOAD_DIR / file_name_without_ext
-        target_folder.mkdir(parents=True, exist_ok=True)
-        logging.debug("Target folder created at: %s", target_folder)
+        file_name_without_ext = Path(file.filename).stem
+        target_folder = workspace.path
+        logging.debug("Workspace created at: %s", target_folder)
 
         # Save uploaded PDF file
-        file_path = target_folder / file.filename
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+        file_path = target_folder / Path(file.filename).name
+        upload = await save_upload(file, file_path, allowed_kinds=("pdf",))
         logging.debug("Saved uploaded file to: %s", file_path)
 
-        # Step 1: Convert PDF to DOCX using LibreOffice
-        logging.debug("Running LibreOffice conversion from PDF to DOCX...")
-        subprocess.run(
-            [
-                "libreoffice",
-                "--headless",              # Run LibreOffice without GUI
-                "--convert-to",            # Specify the conversion type
-                "docx",                    # Convert to DOCX
-                "--outdir", str(target_folder),  # Specify the output directory
-                str(file_path),            # Path to the uploaded PDF
-            ],
-            check=True,  # Ensure the command raises an error if it fails
-        )
-        logging.debug("LibreOffice conversion from PDF to DOCX completed successfully.")
-
-        # Get the converted DOCX file path
-        docx_file_path = target_folder / f"{file_name_without_ext}.docx"
+        export_options = with_images(with_page_range("libreoffice:html:HTML:EmbedImages", page_range), images)
+        cache_key = make_cache_key(upload.sha256, "html", export_options)
+        cached_response = cached_html_response(cache_key, f"{file_name_without_ext}.html", request)
+        if cached_response:
+            return cached_response
+        async def produce():
+            job = await schedule(upload, request, page_range)
+            source_path = await slice_pdf_upload(file_path, page_range) if page_range else file_path
+
+            # Import the PDF once and export only the HTML; the DOCX stage is skipped since nothing uses it
+            logging.debug("Running LibreOffice pdf2html pipeline...")
+            results, timings = await run_conversion(
+                job, libreoffice_breaker, PDF2HTML_PIPELINE.run, ["html"], source=source_path, outdir=target_folder
+            )
+            for name, seconds in timings.items():
+                record_stage(f"pipeline_{name}", seconds)
+            logging.debug("LibreOffice pdf2html pipeline completed successfully.")
+
+            # Get the converted HTML file path
+            html_files = await finish_html(results["html"], images)
+            with timed_stage("cache_store"):
+                return await run_in_threadpool(result_cache.put, cache_key, html_files)
+
+        # Identical uploads converting right now share this conversion
+        html_files = await single_flight.run(cache_key, produce)
         
-        # Step 2: Convert DOCX to HTML using LibreOffice
-        logging.debug("Running LibreOffice conversion from DOCX to HTML...")
-        subprocess.run(
-            [
-                "libreoffice",
-                "--headless",               # Run LibreOffice without its GUI
-                "--convert-to",             # Specify the conversion type
-                "html:HTML:EmbedImages",    # Convert to HTML with embedded images
-                "--outdir", str(target_folder),  # Specify the target folder for the output
-                str(file_path),             # Path to the file you want to convert
-            ],
-            check=True,  # Ensure the command raises an error if it fails
-        )
-        logging.debug("LibreOffice conversion from DOCX to HTML completed successfully.")
-
-        # Get the converted HTML file path
-        html_file_path = target_folder / f"{file_name_without_ext}.html"
-        
-        # Send the HTML file as a response
-        response = FileResponse(
-            path=html_file_path,
-            media_type="text/html",
-            filename=f"{file_name_without_ext}.html",
-            headers={"Content-Disposition": f"attachment; filename={file_name_without_ext}.html"}
-        )
+        # Send the HTML file as a response, precompressed when the client accepts it
+        response = html_file_response(html_files, f"{file_name_without_ext}.html", request)
         logging.debug("Sending HTML response to client.")
-        return response
+        return workspace.cleanup_after(response)
 
-    except subprocess.CalledProcessError as e:
+    except HTTPException:
+        raise
+    except ConversionError as e:
         logging.error("LibreOffice conversion failed with error: %s", e)
         raise HTTPException(status_code=500, detail=f"Conversion failed: {e}")
     except Exception as e:
         logging.error("Unexpected error occurred: %s", e)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {e}")
+    finally:
+        workspace.close()  # Only removes the workspace when no response took it over
+
+
+
+# Batch conversion settings
+BATCH_STREAM_BUFFER = 16  # ZIP chunks held in memory while the client catches up
+
 
+class BatchCancelled(Exception):
+    """Raised in the conversion thread when the client stopped reading the batch response."""
 
 
+def write_batch_zip(sources, names, manifest, batch_folder, convert_to, emit):
+    # Convert every file in one LibreOffice session and add each result to the ZIP as soon as it is ready.
+    # Raises the converter's error, with nothing emitted, when it fails before any file converted
+    output_folder = batch_folder / "output"
+    output_folder.mkdir(exist_ok=True)
+    used_names = set()
+    processed = set()
+    zipf = None  # Opened with the first result, so a batch that converts nothing emits no bytes
+    try:
+        try:
+            for src_path, out_path, error in lo_pool.convert_many(sources, output_folder, convert_to):
+                processed.add(src_path)
+                if error:
+                    manifest.append({"file": names[src_path], "status": "failed", "error": error})
+                    continue
+                arcname = f"{Path(names[src_path]).stem}{out_path.suffix}"
+                if arcname in used_names:
+                    arcname = f"{src_path.name.split('_', 1)[0]}_{arcname}"  # Prefix the upload index to keep names unique
+                used_names.add(arcname)
+                if zipf is None:
+                    emit(b"")  # First result: the response can start
+                    zipf = open_zip_stream(emit)
+                zipf.write(out_path, arcname=arcname)
+                out_path.unlink()
+                manifest.append({"file": names[src_path], "status": "converted", "output": arcname})
+                logging.debug("Added batch result to zip: %s", arcname)
+        except ConversionError as e:
+            logging.error("Batch conversion stopped after %s of %s files: %s", len(processed), len(sources), e)
+            if zipf is None:
+                raise
+            manifest.extend({"file": names[src_path], "status": "failed", "error": str(e)}
+                            for src_path in sources if src_path not in processed)
+        if zipf is None:
+            zipf = open_zip_stream(emit)  # Every file was rejected or failed on its own: the manifest says why
+        zipf.writestr("manifest.json", json.dumps({"files": manifest}, indent=2))
+    finally:
+        if zipf is not None:
+            zipf.close()
+
+
+# Batch route under /api/v1/convert/batch/
+@convert_router_v1.post("/batch/")
+async def upload_batch_v1(request: Request, files: list[UploadFile] = File(...), target_format: str = Form(...)):
+    logging.debug("Received batch conversion request for %s files (target %s).", len(files), target_format)
+
+    target_format = target_format.lower()
+    set_formats("*", target_format)
+    allowed_kinds = tuple(kind for kind, target in LIBREOFFICE_CONVERSIONS if target == target_format)
+    if not allowed_kinds:
+        raise HTTPException(status_code=400, detail=f"Unsupported target format: {target_format}")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. The maximum per batch is {BATCH_MAX_FILES}.")
+
+    batch_folder = workspaces.create("batch")
+
+    # Save every upload; a bad file becomes a manifest entry instead of failing the batch
+    sources, names, manifest = [], {}, []
+    for index, file in enumerate(files):
+        src_path = batch_folder / f"{index:04d}_{Path(file.filename).name}"
+        try:
+            await save_upload(file, src_path, allowed_kinds=allowed_kinds)
+        except HTTPException as e:
+            manifest.append({"file": file.filename, "status": "rejected", "error": e.detail})
+            continue
+        sources.append(src_path)
+        names[src_path] = file.filename
+    # Every source kind maps to the same LibreOffice filter for a given target
+    convert_to = LIBREOFFICE_CONVERSIONS[(allowed_kinds[0], target_format)][0]
+
+    chunks = queue.Queue(maxsize=BATCH_STREAM_BUFFER)
+    cancelled = threading.Event()
+    started = threading.Event()
+
+    def emit(chunk):
+        # Block while the client is slow, but give up once it has disconnected
+        started.set()
+        while True:
+            if cancelled.is_set():
+                raise BatchCancelled()
+            try:
+                chunks.put(chunk, timeout=1)
+                return
+            except queue.Full:
+                pass
+
+    def run_batch():
+        try:
+            write_batch_zip(sources, names, manifest, batch_folder, convert_to, emit)
+        except BatchCancelled:
+            logging.warning("Batch %s abandoned by the client", batch_folder.name)
+        except Exception as e:
+            logging.error("Batch %s failed: %s", batch_folder.name, e)
+            if not started.is_set():
+                chunks.put(e)  # Nothing sent yet: the route answers with an error instead of a ZIP
+        finally:
+            workspaces.release(batch_folder)
+            try:
+                emit(None)  # End of stream
+            except BatchCancelled:
+                pass
+
+    try:
+        bulk_executor.submit(run_batch, client=client_id(request))  # A whole batch holds a converter for long
+    except HTTPException:
+        workspaces.release(batch_folder)
+        raise
+
+    async def next_chunk():
+        while True:
+            try:
+                return await run_in_threadpool(chunks.get, True, 1)
+            except queue.Empty:
+                continue
+
+    # Hold the response back until the first file converted, so a batch that cannot start fails as a whole
+    first_chunk = await next_chunk()
+    if isinstance(first_chunk, Exception):
+        cancelled.set()
+        if isinstance(first_chunk, (ConverterCrashed, ConverterUnavailable)):
+            raise HTTPException(status_code=503, detail=f"Batch conversion failed: {first_chunk}",
+                                headers={"Retry-After": str(bulk_executor.retry_after)})
+        raise HTTPException(status_code=500, detail=f"Batch conversion failed: {first_chunk}")
+
+    async def stream_zip():
+        try:
+            chunk = first_chunk
+            while chunk is not None:
+                yield chunk
+                chunk = await next_chunk()
+        finally:
+            cancelled.set()
+
+    logging.debug("Streaming batch results for %s files.", len(sources))
+    return StreamingResponse(
+        stream_zip(),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=converted_batch.zip"}
+    )
+
 # Version 2: File upload route under /api/v2/convert/upload-docx/
 convert_router_v2 = APIRouter(prefix="/api/v2/convert", tags=["convert-v2"])
 
@@ -345,8 +769,13 @@ async def root_v2():
     return {"message": "Welcome to the Conversion file upload and conversion service! (v2)"}
 
 @convert_router_v2.post("/docx2html/")
-async def upload_docx_v2(file: UploadFile = File(...)):
+async def upload_docx_v2(
+    request: Request,
+    file: UploadFile = File(...),
+    images: str = Query("embedded", pattern=IMAGES_MODE_PATTERN),
+):
     logging.debug("Received file upload request for v2.")
+    set_formats("docx", "html")
 
     # Validate MIME type for DOCX
     if file.content_type != "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
@@ -355,84 +784,102 @@ async def upload_docx_v2(file: UploadFile = File(...)):
             status_code=400, detail="Invalid file type. Please upload a DOCX file."
         )
 
+    # Scratch directory of this request only, so uploads sharing a file name cannot clash
+    workspace = workspaces.workspace()
     try:
         # Define paths
-        file_name_without_ext = file.filename.rsplit(".", 1)[0]
-        target_folder = BASE_UPLOAD_DIR / file_name_without_ext
-        target_folder.mkdir(parents=True, exist_ok=True)
-        logging.debug("Target folder created at: %s", target_folder)
+        file_name_without_ext = Path(file.filename).stem
+        target_folder = workspace.path
+        logging.debug("Workspace created at: %s", target_folder)
 
         # Save uploaded file
-        file_path = target_folder / file.filename
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
+        file_path = target_folder / Path(file.filename).name
+        upload = await save_upload(file, file_path, allowed_kinds=("docx",))
         logging.debug("Saved uploaded file to: %s", file_path)
 
-        # Convert DOCX to HTML using Spire.Doc (Ensure Spire.Doc is installed and accessible)
-        document = Document()
-
-        # Load the DOCX file
-        document.LoadFromFile(str(file_path))
-
-        # Export document style to head in HTML
-        document.HtmlExportOptions.IsExportDocumentStyles = True
-
-        # Set the type of CSS style sheet as internal
-        document.HtmlExportOptions.CssStyleSheetType = CssStyleSheetType.Internal
-
-        # Embed images in HTML code
-        document.HtmlExportOptions.ImageEmbedded = True
-
-        # Export form fields as text
-        document.HtmlExportOptions.IsTextInputFormFieldAsText = True
+        cache_key = make_cache_key(upload.sha256, "html", with_images(SPIRE_HTML_EXPORT_OPTIONS, images))
+        cached_response = cached_html_response(cache_key, f"{file_name_without_ext}.html", request)
+        if cached_response:
+            return cached_response
 
-        # Save the document as an HTML file
-        html_file_path = str(file_path).replace(".docx", ".html")
-        document.SaveToFile(html_file_path, FileFormat.Html)
-        logging.debug(f"Converted DOCX to HTML: {html_file_path}")
+        async def produce():
+            # Convert DOCX to HTML using Spire.Doc in a warm worker process
+            job = await schedule(upload, request)
+            html_file_path = await run_conversion(job, spire_breaker, spire_pool.convert_docx_to_html, file_path)
+            html_files = await finish_html(html_file_path, images)
+            with timed_stage("cache_store"):
+                return await run_in_threadpool(result_cache.put, cache_key, html_files)
 
-        # Read the HTML file and apply regex to remove the <span> with the warning text
-        with open(html_file_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
+        # Identical uploads converting right now share this conversion
+        html_files = await single_flight.run(cache_key, produce)
 
-        # Regex pattern to remove both types of evaluation warning spans
-        pattern = r'<span\s+style="[^"]*(font-family:\'Times New Roman\';\s*)?color:#ff0000[^"]*">Evaluation Warning: The document was created with Spire\.Doc for Python\.</span>'
-
-        # Remove the matching pattern from the HTML content
-        html_content = re.sub(pattern, '', html_content)
-
-        # Logging the result
-        logging.debug("Removed evaluation warning span from HTML.")
-                # Save the modified HTML back to the file
-        with open(html_file_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        logging.debug(f"Modified HTML file saved at: {html_file_path}")
-
-        # Dispose of the document object to release resources
-        document.Dispose()
-
-        # Send the modified HTML file back as a download
-        return FileResponse(
-            path=html_file_path,
-            media_type="text/html",
-            filename=os.path.basename(html_file_path),
-            headers={"Content-Disposition": f"attachment; filename={os.path.basename(html_file_path)}"}
-        )
+        # Send the modified HTML file back as a download, precompressed when the client accepts it
+        return workspace.cleanup_after(html_file_response(html_files, f"{file_name_without_ext}.html", request))
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"An error occurred during conversion: {e}")
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
-
-
-# Endpoint to fetch last 50 logs from Redis
+    finally:
+        workspace.close()  # Only removes the workspace when no response took it over
+
+
+# Liveness probe: the process is up and serving requests
+@app.get("/health/live")
+def health_live():
+    return {"status": "alive"}
+
+# Readiness probe: fails until the converter warm-up (CONVERSION_WARMUP) has finished
+@app.get("/health/ready")
+def health_ready():
+    if not warmup.ready:
+        raise HTTPException(status_code=503, detail="Warming up converters", headers={"Retry-After": "1"})
+    if CONVERSION_WARMUP_REQUIRED and not warmup.healthy:
+        raise HTTPException(status_code=503, detail=f"Warm-up failed: {', '.join(warmup.failed + warmup.skipped)}")
+    return {"status": "ready", "warmup": warmup.timings, "failed": warmup.failed, "skipped": warmup.skipped}
+
+# Images moved out of converted HTML (?images=external), named by the hash of their bytes
+@app.get("/assets/{name}")
+def get_asset(name: str, request: Request):
+    path = asset_store.path_for(name)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Asset not found")
+    etag = f'"{Path(name).stem}"'
+    headers = {"ETag": etag, **ASSET_HEADERS}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers)
+
+# Endpoint exposing this process's metrics in the Prometheus text format
+@app.get("/metrics")
+def get_metrics():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Endpoint exposing result cache counters, used to size the cache
+@app.get("/cache/stats")
+def get_cache_stats():
+    return result_cache.stats()
+
+# Endpoint to fetch logs from Redis (last 50 by default)
 @app.get("/logs")
-async def get_logs():
+def get_logs(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=1000),
+    level: str | None = Query(None, pattern="^(DEBUG|INFO|WARNING|ERROR|CRITICAL)$"),
+):
     try:
-        # Fetch the last 50 logs from Redis
-        logs = redis_client.lrange("app_logs", 0, 49)  # Get the last 50 logs
-        logs.reverse()  # Redis stores logs in reverse order
-        return {"logs": logs}
+        # Fetch one page of logs from Redis, newest page first, optionally only at or above a level
+        logs = read_logs(redis_client, page=page, page_size=page_size, min_level=level)
+        return {
+            "logs": logs,
+            "page": page,
+            "page_size": page_size,
+            "level": level,
+            "dropped": redis_log_handler.dropped,
+            "failed": redis_log_handler.failed,
+        }
     except redis.exceptions.ConnectionError as e:
         logging.error(f"Error fetching logs from Redis: {e}")
         raise HTTPException(status_code=500, detail="Error fetching logs from Redis")
@@ -440,3 +887,4 @@ async def get_logs():
 # Include the versioned routers in the main FastAPI app
 app.include_router(convert_router_v1)
 app.include_router(convert_router_v2)
+app.include_router(jobs_router)
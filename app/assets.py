@@ -0,0 +1,161 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from metrics import html_assets
+
+# Asset store configuration (overridable through the environment)
+ASSETS_DIR = Path(os.environ.get("ASSETS_DIR", "assets"))
+ASSETS_BASE_URL = os.environ.get("ASSETS_BASE_URL", "/assets/")  # Prefix of the asset URLs written into the HTML
+ASSETS_MAX_AGE = float(os.environ.get("ASSETS_MAX_AGE", "0"))  # Seconds an unused asset is kept, 0 keeps them all
+ASSETS_SWEEP_INTERVAL = 3600
+ASSETS_CHUNK_SIZE = 64 * 1024
+
+# Image types worth externalizing -> file extension; anything else stays inline
+IMAGE_EXTENSIONS = {
+    "png": "png",
+    "jpeg": "jpg",
+    "jpg": "jpg",
+    "gif": "gif",
+    "webp": "webp",
+    "bmp": "bmp",
+    "svg+xml": "svg",
+    "tiff": "tiff",
+}
+ASSET_NAME_PATTERN = re.compile(r"^[0-9a-f]{64}\.(" + "|".join(sorted(set(IMAGE_EXTENSIONS.values()))) + r")$")
+
+# Base64 image as emitted by LibreOffice and Spire.Doc, in src="..." or CSS url(...)
+DATA_URI_PATTERN = re.compile(r"data:image/([A-Za-z0-9.+-]+);base64,([A-Za-z0-9+/=\r\n]+)")
+DATA_URI_START = "data:image/"
+MAX_DATA_URI_HEADER = 64  # "data:image/<type>;base64," is never longer than this
+
+
+def _split_at_incomplete_uri(text):
+    # Index from which ``text`` may continue in the next chunk: an unterminated data URI or a partial "data:image/"
+    start = text.rfind(DATA_URI_START)
+    if start != -1:
+        match = DATA_URI_PATTERN.match(text, start)
+        if match is None:
+            if len(text) - start < MAX_DATA_URI_HEADER:
+                return start  # Header still arriving
+        elif match.end() == len(text):
+            return start  # Base64 may go on in the next chunk
+        else:
+            return max(len(text) - len(DATA_URI_START) + 1, match.end())
+    return max(len(text) - len(DATA_URI_START) + 1, 0)
+
+
+class AssetStore:
+    """Content-addressed image files shared by every converted document.
+
+    Each image is stored once under the SHA-256 of its bytes, so the same logo in many documents
+    is one file, and its URL can be cached by clients forever.
+    """
+
+    def __init__(self, root=ASSETS_DIR, base_url=ASSETS_BASE_URL, max_age=ASSETS_MAX_AGE):
+        self.root = Path(root)
+        self.base_url = base_url
+        self.max_age = max_age
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def path_for(self, name):
+        # None unless ``name`` is an asset name this store could have written
+        if not ASSET_NAME_PATTERN.match(name):
+            return None
+        return self.root / name[:2] / name
+
+    def put(self, data, extension):
+        """Store ``data`` (unless an identical image already is) and return its asset name."""
+        name = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+        path = self.root / name[:2] / name
+        if path.exists():
+            os.utime(path)  # Still in use, keep it from the sweeper
+            html_assets.inc(result="deduplicated")
+            return name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = path.with_name(f".{uuid.uuid4().hex}.partial")
+        partial_path.write_bytes(data)
+        partial_path.replace(path)  # Atomic, so a concurrent reader never sees half an image
+        html_assets.inc(result="stored")
+        return name
+
+    def _replace(self, match):
+        extension = IMAGE_EXTENSIONS.get(match.group(1).lower())
+        if extension is None:
+            return match.group(0)
+        try:
+            data = base64.b64decode(re.sub(r"\s+", "", match.group(2)), validate=True)
+        except (binascii.Error, ValueError):
+            return match.group(0)
+        return self.base_url + self.put(data, extension)
+
+    def _rewrite(self, chunks):
+        pending = ""
+        for chunk in chunks:
+            text = pending + chunk
+            cut = _split_at_incomplete_uri(text)
+            pending = text[cut:]
+            if cut:
+                yield DATA_URI_PATTERN.sub(self._replace, text[:cut])
+        if pending:
+            yield DATA_URI_PATTERN.sub(self._replace, pending)
+
+    def externalize(self, html_path):
+        """Replace the base64 images of ``html_path`` by asset URLs, streaming; returns the same path."""
+        html_path = Path(html_path)
+        rewritten_path = html_path.with_suffix(".assets.html")
+        with open(html_path, "r", encoding="utf-8", errors="surrogateescape") as src, \
+                open(rewritten_path, "w", encoding="utf-8", errors="surrogateescape") as dst:
+            for text in self._rewrite(iter(lambda: src.read(ASSETS_CHUNK_SIZE), "")):
+                dst.write(text)
+        rewritten_path.replace(html_path)
+        return html_path
+
+    def sweep(self):
+        """Remove assets not written or reused for ``max_age`` seconds."""
+        if not self.max_age or not self.root.is_dir():
+            return 0
+        cutoff = time.time() - self.max_age
+        removed = 0
+        for path in self.root.glob("*/*"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            logging.info("Asset sweep removed %s unused images", removed)
+        return removed
+
+    def _sweep_loop(self):
+        while not self._stopped.wait(ASSETS_SWEEP_INTERVAL):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error("Asset sweep failed: %s", e)
+
+    def start(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.max_age:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._sweep_loop, name="asset-sweeper", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Shared asset store used by the API routes
+asset_store = AssetStore()
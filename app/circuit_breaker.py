@@ -0,0 +1,76 @@
+import logging
+import os
+import threading
+import time
+
+# Breaker configuration (overridable through the environment)
+CIRCUIT_BREAKER_THRESHOLD = int(os.environ.get("CIRCUIT_BREAKER_THRESHOLD", "5"))  # Consecutive crashes/timeouts
+CIRCUIT_BREAKER_COOLDOWN = float(os.environ.get("CIRCUIT_BREAKER_COOLDOWN", "30"))  # Seconds before a trial call
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a converter whose circuit is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"The {name} converter is failing, please retry later.")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Fails fast once a converter keeps crashing or timing out.
+
+    After ``threshold`` consecutive failures the circuit opens and calls are refused for ``cooldown``
+    seconds; then a single trial call is let through, which closes the circuit again or reopens it.
+    """
+
+    def __init__(self, name, threshold=CIRCUIT_BREAKER_THRESHOLD, cooldown=CIRCUIT_BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None  # Set while open or half-open
+        self._trial_running = False
+
+    @property
+    def is_open(self):
+        with self._lock:
+            return self._opened_at is not None
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go ahead now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self._opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self._trial_running:
+                raise CircuitOpenError(self.name, max(1, int(remaining + 0.5)))
+            self._trial_running = True
+            logging.info("Circuit for %s half-open, letting a trial conversion through", self.name)
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logging.info("Circuit for %s closed", self.name)
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (self._opened_at is None and self._failures >= self.threshold):
+                logging.warning("Circuit for %s opened after %s consecutive failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        # The call never reached the converter (e.g. rejected as busy): let another trial through
+        with self._lock:
+            self._trial_running = False
+
+
+# One breaker per converter
+libreoffice_breaker = CircuitBreaker("libreoffice")
+spire_breaker = CircuitBreaker("spire")
+pdf_text_breaker = CircuitBreaker("pdf_text")
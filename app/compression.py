@@ -0,0 +1,95 @@
+import gzip
+import logging
+import shutil
+from pathlib import Path
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6  # Brotli's higher levels cost far more time than they save in bytes
+
+# Content-Encoding -> suffix of the precompressed variant next to the original file
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Server preference when the client accepts several encodings with the same weight
+ENCODING_PREFERENCE = ("br", "gzip", "identity")
+
+
+def _brotli():
+    try:
+        import brotli  # Optional: without it only gzip variants are written
+    except ImportError:
+        return None
+    return brotli
+
+
+def precompress(path):
+    """Write gzip (and, when available, brotli) variants next to ``path``; returns their paths."""
+    path = Path(path)
+    variants = []
+    gzip_path = path.with_name(path.name + ENCODING_SUFFIXES["gzip"])
+    with open(path, "rb") as src, gzip.open(gzip_path, "wb", compresslevel=GZIP_LEVEL) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    variants.append(gzip_path)
+
+    brotli = _brotli()
+    if brotli is not None:
+        brotli_path = path.with_name(path.name + ENCODING_SUFFIXES["br"])
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        with open(path, "rb") as src, open(brotli_path, "wb") as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+        variants.append(brotli_path)
+    logging.debug("Precompressed %s into %s", path.name, ", ".join(variant.name for variant in variants))
+    return variants
+
+
+def parse_accept_encoding(header):
+    # {coding: weight} from an Accept-Encoding header; "*" applies to codings not listed
+    weights = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+def choose_encoding(header, available):
+    """Best encoding among ``available`` for an Accept-Encoding header; "identity" when nothing better is accepted."""
+    weights = parse_accept_encoding(header)
+    if not weights:
+        return "identity"  # No header: plain clients (curl without --compressed) expect the file as-is
+    default = weights.get("*", 0.0)
+    best, best_weight = "identity", 0.0
+    for coding in ENCODING_PREFERENCE:
+        if coding != "identity" and coding not in available:
+            continue
+        if coding == "identity":
+            weight = weights.get("identity", weights.get("*", 1.0))  # Identity is acceptable unless refused
+        else:
+            weight = weights.get(coding, default)
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def encoded_variants(files):
+    """Split cached output files into (original, {encoding: precompressed path})."""
+    variants = {}
+    original = None
+    for path in files:
+        path = Path(path)
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            if path.name.endswith(suffix):
+                variants[encoding] = path
+                break
+        else:
+            original = original or path
+    return original, variants
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from fastapi import HTTPException
+
+from metrics import lane_admissions, lane_wait_seconds, record_stage
+
+# Executor configuration (overridable through the environment)
+CONVERSION_MAX_IN_FLIGHT = int(os.environ.get("CONVERSION_MAX_IN_FLIGHT", "4"))  # Fast lane
+CONVERSION_MAX_QUEUED = int(os.environ.get("CONVERSION_MAX_QUEUED", "16"))
+CONVERSION_BULK_MAX_IN_FLIGHT = int(os.environ.get("CONVERSION_BULK_MAX_IN_FLIGHT", "1"))  # Keep below the LibreOffice pool size
+CONVERSION_BULK_MAX_QUEUED = int(os.environ.get("CONVERSION_BULK_MAX_QUEUED", "8"))
+CONVERSION_CLIENT_SHARE = float(os.environ.get("CONVERSION_CLIENT_SHARE", "0"))  # Largest share of a lane per client, 0 disables
+CONVERSION_RETRY_AFTER = int(os.environ.get("CONVERSION_RETRY_AFTER", "5"))  # Seconds suggested to rejected clients
+
+
+class ConversionExecutor:
+    """Runs blocking conversion work on worker threads with a bounded in-flight count and wait queue.
+
+    Each lane of work has its own executor, so cheap jobs never wait behind expensive ones. With a
+    client share, one client may hold at most that fraction of the lane's running and queued jobs.
+    """
+
+    def __init__(self, lane="fast", max_in_flight=CONVERSION_MAX_IN_FLIGHT, max_queued=CONVERSION_MAX_QUEUED,
+                 retry_after=CONVERSION_RETRY_AFTER, client_share=CONVERSION_CLIENT_SHARE):
+        self.lane = lane
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.retry_after = retry_after
+        self.client_limit = max(1, int(client_share * (max_in_flight + max_queued))) if client_share else None
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix=f"conversion-{lane}")
+        self._lock = threading.Lock()
+        self._admitted = 0  # Jobs running or waiting for a thread
+        self._running = 0
+        self._clients = defaultdict(int)  # Client -> jobs admitted
+
+    @property
+    def in_flight(self):
+        return self._running
+
+    @property
+    def queued(self):
+        return self._admitted - self._running
+
+    async def run(self, fn, *args, client=None, **kwargs):
+        """Run ``fn`` on a worker thread for ``client``, recording its queue wait and run time as request stages."""
+        started = []
+
+        def timed_call():
+            started.append(time.perf_counter())
+            return fn(*args, **kwargs)
+
+        submitted = time.perf_counter()
+        try:
+            return await self.submit(timed_call, client=client)
+        finally:
+            finished = time.perf_counter()
+            began = started[0] if started else finished
+            record_stage("queue_wait", began - submitted)
+            record_stage("convert", finished - began)
+            if started:
+                lane_wait_seconds.observe(began - submitted, lane=self.lane)
+
+    def submit(self, fn, *args, client=None, **kwargs):
+        # Admit the job or reject it straight away once every slot and queue position is taken,
+        # or once the client holds its share of them. Must be called from the event loop; returns
+        # an awaitable for the result.
+        with self._lock:
+            if self._admitted >= self.max_in_flight + self.max_queued:
+                lane_admissions.inc(lane=self.lane, result="busy")
+                logging.warning("Conversion queue of the %s lane full (%s admitted), rejecting request",
+                                self.lane, self._admitted)
+                raise HTTPException(
+                    status_code=503,
+                    detail="Conversion service is busy, please retry later.",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            if client is not None and self.client_limit and self._clients[client] >= self.client_limit:
+                lane_admissions.inc(lane=self.lane, result="client_share")
+                logging.warning("Client %s holds its share of the %s lane (%s jobs), rejecting request",
+                                client, self.lane, self._clients[client])
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many conversions of yours are running or queued, please retry later.",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self._admitted += 1
+            if client is not None:
+                self._clients[client] += 1
+        lane_admissions.inc(lane=self.lane, result="admitted")
+
+        future = self._executor.submit(self._call, fn, args, kwargs)
+        # Release the slot when the thread finishes, even if the client has gone away
+        future.add_done_callback(partial(self._release, client))
+        return asyncio.wrap_future(future)
+
+    def _call(self, fn, args, kwargs):
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def _release(self, client, future):
+        with self._lock:
+            self._admitted -= 1
+            if client is not None:
+                self._clients[client] -= 1
+                if not self._clients[client]:
+                    del self._clients[client]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared executors used by the API routes: the default fast lane and the bulk lane for expensive jobs
+conversion_executor = ConversionExecutor("fast")
+bulk_executor = ConversionExecutor("bulk", CONVERSION_BULK_MAX_IN_FLIGHT, CONVERSION_BULK_MAX_QUEUED)
+lanes = {"fast": conversion_executor, "bulk": bulk_executor}
@@ -0,0 +1,84 @@
+import logging
+import os
+import re
+import zipfile
+from collections import namedtuple
+
+from page_ranges import page_indices
+
+# Cost model configuration (overridable through the environment); costs are in page equivalents
+CONVERSION_BULK_COST = float(os.environ.get("CONVERSION_BULK_COST", "50"))  # From this cost a job goes to the bulk lane
+COST_BYTES_PER_PAGE = int(os.environ.get("COST_BYTES_PER_PAGE", str(256 * 1024)))  # Bytes counted as one page
+COST_IMAGE_WEIGHT = float(os.environ.get("COST_IMAGE_WEIGHT", "0.5"))  # Pages one embedded image counts for
+COST_SCAN_CHUNK_SIZE = 1024 * 1024
+
+DOCX_PAGES_PATTERN = re.compile(rb"<(?:\w+:)?Pages>\s*(\d+)\s*</(?:\w+:)?Pages>")
+DOCX_MEDIA_PREFIX = "word/media/"
+PDF_IMAGE_PATTERN = re.compile(rb"/Subtype\s*/Image\b")
+PDF_IMAGE_OVERLAP = 32  # Bytes kept between scanned chunks so a split marker is still found
+
+JobCost = namedtuple("JobCost", ["size", "pages", "images", "score"])
+
+
+def _docx_counts(path):
+    # Page count as last saved by Word (docProps/app.xml) and number of embedded media files
+    try:
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            images = sum(1 for name in names if name.startswith(DOCX_MEDIA_PREFIX))
+            pages = None
+            if "docProps/app.xml" in names:
+                match = DOCX_PAGES_PATTERN.search(archive.read("docProps/app.xml"))
+                pages = int(match.group(1)) if match else None
+    except (zipfile.BadZipFile, OSError, KeyError) as e:
+        logging.debug("Could not inspect %s for its cost: %s", path, e)
+        return None, 0
+    return pages or None, images
+
+
+def _pdf_counts(path):
+    # Page count from the page tree, and image XObjects (never inside compressed object streams)
+    import PyPDF2
+
+    try:
+        pages = len(PyPDF2.PdfReader(str(path)).pages)
+    except Exception as e:
+        logging.debug("Could not read the page tree of %s: %s", path, e)
+        pages = None
+    images = 0
+    tail = b""
+    with open(path, "rb") as pdf_file:
+        for chunk in iter(lambda: pdf_file.read(COST_SCAN_CHUNK_SIZE), b""):
+            data = tail + chunk
+            # Count only markers ending in the new bytes, so one straddling the boundary is counted once
+            images += sum(1 for match in PDF_IMAGE_PATTERN.finditer(data) if match.end() > len(tail))
+            tail = data[-PDF_IMAGE_OVERLAP:]
+    return pages, images
+
+
+def estimate_cost(path, kind, page_intervals=None):
+    """Estimate what converting ``path`` costs, in page equivalents, from its size, pages and images.
+
+    With ``page_intervals`` (a page range or preview) only the selected share of the document counts.
+    """
+    size = os.path.getsize(path)
+    if kind == "docx":
+        pages, images = _docx_counts(path)
+    elif kind == "pdf":
+        pages, images = _pdf_counts(path)
+    else:
+        pages, images = None, 0  # Legacy .doc: size only
+
+    if page_intervals:
+        selected = len(page_indices(page_intervals, pages)) if pages else sum(last - first + 1 for first, last in page_intervals)
+        if pages:
+            share = selected / pages
+            size, images = int(size * share), round(images * share)
+        pages = selected
+    score = max(pages or 0, size / COST_BYTES_PER_PAGE) + images * COST_IMAGE_WEIGHT
+    return JobCost(size, pages, images, round(score, 1))
+
+
+def lane_for(cost):
+    # "bulk" for jobs that would hold a converter long enough to stall interactive requests
+    return "bulk" if cost.score >= CONVERSION_BULK_COST else "fast"
@@ -0,0 +1,110 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from pathlib import Path
+
+import redis
+
+from jobs import (JOB_LEASE_TTL, dequeue_job, finish_job, get_job, reclaim_jobs, remove_expired_job_files,
+                  update_job, worker_heartbeat, worker_stopped)
+from libreoffice_pool import LIBREOFFICE_CONVERSIONS, LIBREOFFICE_PROFILE_ROOT, lo_pool
+from watchdog import reap_orphans
+
+# Worker configuration (overridable through the environment)
+JOB_WORKER_NAME = os.environ.get("JOB_WORKER_NAME", f"{socket.gethostname()}:{os.getpid()}")
+JOB_SWEEP_INTERVAL = float(os.environ.get("JOB_SWEEP_INTERVAL", "600"))  # Seconds between expired job file sweeps
+JOB_RECLAIM_INTERVAL = float(os.environ.get("JOB_RECLAIM_INTERVAL", "30"))  # Seconds between sweeps for jobs of dead workers
+
+stopping = False
+
+
+def request_stop(signum, frame):
+    global stopping
+    logging.info("Job worker %s stopping after the current job", JOB_WORKER_NAME)
+    stopping = True
+
+
+class WorkerHeartbeat:
+    """Refreshes this worker's liveness key, also while a long conversion runs, so only a dead worker's jobs are reclaimed."""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-worker-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(JOB_LEASE_TTL / 3):
+            try:
+                worker_heartbeat(self.worker)
+            except redis.exceptions.RedisError as e:
+                logging.warning("Could not refresh the heartbeat of job worker %s: %s", self.worker, e)
+
+    def start(self):
+        worker_heartbeat(self.worker)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def run_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        logging.warning("Job %s expired before it was picked up", job_id)
+        return
+
+    logging.info("Job worker %s running job %s", JOB_WORKER_NAME, job_id)
+    update_job(job_id, state="running", progress=10, worker=JOB_WORKER_NAME, attempts=int(job.get("attempts", 0)) + 1)
+    convert_to, _ = LIBREOFFICE_CONVERSIONS[(job["source_kind"], job["target_format"])]
+    input_path = Path(job["input_path"])
+    output_dir = input_path.parent / "output"
+    output_dir.mkdir(exist_ok=True)
+    started = time.monotonic()
+    try:
+        result_path = lo_pool.convert(input_path, output_dir, convert_to)
+        if not result_path.exists():
+            raise FileNotFoundError(f"Converter produced no {job['target_format']} output")
+    except Exception as e:
+        logging.error("Job %s failed: %s", job_id, e)
+        update_job(job_id, state="failed", progress=100, error=str(e))
+        return
+    update_job(job_id, state="done", progress=100, result_path=result_path,
+               duration=round(time.monotonic() - started, 3))
+    logging.info("Job %s finished in %.2fs", job_id, time.monotonic() - started)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    lo_pool.start()
+    heartbeat = WorkerHeartbeat(JOB_WORKER_NAME)
+    heartbeat.start()
+    reclaim_jobs(restarted_worker=JOB_WORKER_NAME)  # A previous process with this name may have died mid-job
+    last_sweep = last_reclaim = 0
+    logging.info("Job worker %s waiting for jobs", JOB_WORKER_NAME)
+    try:
+        while not stopping:
+            if time.monotonic() - last_sweep > JOB_SWEEP_INTERVAL:
+                remove_expired_job_files()
+                reap_orphans(LIBREOFFICE_PROFILE_ROOT)
+                last_sweep = time.monotonic()
+            if time.monotonic() - last_reclaim > JOB_RECLAIM_INTERVAL:
+                reclaim_jobs()
+                last_reclaim = time.monotonic()
+            job_id = dequeue_job(JOB_WORKER_NAME, timeout=5)
+            if job_id:
+                run_job(job_id)
+                finish_job(JOB_WORKER_NAME, job_id)  # Left on the list if run_job() raised, for another worker
+    finally:
+        heartbeat.stop()
+        worker_stopped(JOB_WORKER_NAME)
+        lo_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import redis
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from libreoffice_pool import LIBREOFFICE_CONVERSIONS
+from redis_conn import redis_client
+from uploads import save_upload
+
+# Job queue configuration (overridable through the environment)
+JOBS_DIR = Path(os.environ.get("JOBS_DIR", "jobs"))  # Must be shared between the API and the job workers
+JOB_TTL = int(os.environ.get("JOB_TTL", str(24 * 60 * 60)))  # Seconds a finished job and its status are kept
+JOB_LEASE_TTL = float(os.environ.get("JOB_LEASE_TTL", "30"))  # Seconds a job worker counts as alive after its last heartbeat
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))  # Runs of a job cut short by a dying worker before it fails
+JOB_QUEUE_KEY = "conversion_jobs:queue"
+JOB_PROCESSING_KEY_PREFIX = "conversion_jobs:processing:"
+JOB_WORKER_KEY_PREFIX = "conversion_jobs:worker:"
+JOB_KEY_PREFIX = "conversion_job:"
+
+def job_key(job_id):
+    return f"{JOB_KEY_PREFIX}{job_id}"
+
+
+def get_job(job_id):
+    job = redis_client.hgetall(job_key(job_id))
+    return job or None
+
+
+def update_job(job_id, **fields):
+    fields["updated_at"] = time.time()
+    redis_client.hset(job_key(job_id), mapping={name: str(value) for name, value in fields.items()})
+
+
+def enqueue_job(job_id, input_path, filename, source_kind, target_format):
+    now = time.time()
+    pipe = redis_client.pipeline()
+    pipe.hset(job_key(job_id), mapping={
+        "id": job_id,
+        "state": "queued",
+        "progress": 0,
+        "filename": filename,
+        "source_kind": source_kind,
+        "target_format": target_format,
+        "input_path": str(input_path),
+        "created_at": now,
+        "updated_at": now,
+    })
+    pipe.expire(job_key(job_id), JOB_TTL)
+    pipe.lpush(JOB_QUEUE_KEY, job_id)
+    pipe.execute()
+
+
+def processing_key(worker):
+    return f"{JOB_PROCESSING_KEY_PREFIX}{worker}"
+
+
+def worker_key(worker):
+    return f"{JOB_WORKER_KEY_PREFIX}{worker}"
+
+
+def dequeue_job(worker, timeout=5):
+    # Blocks for up to ``timeout`` seconds; returns None when the queue stayed empty. The job stays on
+    # the worker's processing list until finish_job(), so it is not lost if the worker dies meanwhile
+    return redis_client.blmove(JOB_QUEUE_KEY, processing_key(worker), timeout, "RIGHT", "LEFT")
+
+
+def finish_job(worker, job_id):
+    redis_client.lrem(processing_key(worker), 0, job_id)
+
+
+def worker_heartbeat(worker):
+    redis_client.set(worker_key(worker), time.time(), px=int(JOB_LEASE_TTL * 1000))
+
+
+def worker_stopped(worker):
+    # Anything still on its processing list gets reclaimed by the other workers
+    redis_client.delete(worker_key(worker))
+
+
+def _reclaim_one(key):
+    # Take the oldest job off a processing list and queue it again; None once the list is empty
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(key)
+                job_id = pipe.lindex(key, -1)
+                if job_id is None:
+                    return None
+                job = pipe.hgetall(job_key(job_id))
+                pipe.multi()
+                pipe.lrem(key, 1, job_id)
+                if not job or job["state"] in ("done", "failed"):
+                    pass  # Finished, or expired, just before its worker stopped
+                elif int(job.get("attempts", 0)) >= JOB_MAX_ATTEMPTS:
+                    pipe.hset(job_key(job_id), mapping={
+                        "state": "failed",
+                        "progress": 100,
+                        "error": f"Job worker stopped during each of {JOB_MAX_ATTEMPTS} attempts",
+                        "updated_at": time.time(),
+                    })
+                else:
+                    pipe.hset(job_key(job_id), mapping={"state": "queued", "progress": 0, "updated_at": time.time()})
+                    pipe.rpush(JOB_QUEUE_KEY, job_id)  # The next job to be picked up
+                pipe.execute()
+                return job_id
+            except redis.exceptions.WatchError:
+                continue  # Another worker reclaimed from the same list
+
+
+def reclaim_jobs(restarted_worker=None):
+    """Queue again the jobs of workers whose heartbeat expired, and those ``restarted_worker`` left behind."""
+    reclaimed = []
+    for key in redis_client.scan_iter(match=f"{JOB_PROCESSING_KEY_PREFIX}*"):
+        worker = key[len(JOB_PROCESSING_KEY_PREFIX):]
+        if worker != restarted_worker and redis_client.exists(worker_key(worker)):
+            continue
+        while (job_id := _reclaim_one(key)) is not None:
+            logging.warning("Reclaimed job %s from stopped job worker %s", job_id, worker)
+            reclaimed.append(job_id)
+    return reclaimed
+
+
+def queue_length():
+    return redis_client.llen(JOB_QUEUE_KEY)
+
+
+def remove_expired_job_files():
+    # Job hashes expire in Redis on their own; their input/output files have to be swept here
+    cutoff = time.time() - JOB_TTL
+    if not JOBS_DIR.exists():
+        return
+    for job_dir in JOBS_DIR.iterdir():
+        if job_dir.is_dir() and job_dir.stat().st_mtime < cutoff:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            logging.debug("Removed expired job files: %s", job_dir)
+
+
+def job_status(job):
+    status = {
+        "job_id": job["id"],
+        "state": job["state"],
+        "progress": int(job.get("progress", 0)),
+        "filename": job["filename"],
+        "target_format": job["target_format"],
+        "created_at": float(job["created_at"]),
+        "updated_at": float(job["updated_at"]),
+    }
+    if job["state"] == "queued":
+        status["queue_length"] = queue_length()
+    if job["state"] == "done":
+        status["result_url"] = f"{jobs_router.prefix}/{job['id']}/result"
+    if job.get("error"):
+        status["error"] = job["error"]
+    return status
+
+
+# Asynchronous conversion jobs, run by job_worker.py processes
+jobs_router = APIRouter(prefix="/api/v1/jobs", tags=["jobs-v1"])
+
+
+@jobs_router.post("/", status_code=202)
+async def submit_job(file: UploadFile = File(...), target_format: str = Form(...)):
+    logging.debug("Received conversion job submission (target %s).", target_format)
+    target_format = target_format.lower()
+    allowed_kinds = tuple(kind for kind, target in LIBREOFFICE_CONVERSIONS if target == target_format)
+    if not allowed_kinds:
+        raise HTTPException(status_code=400, detail=f"Unsupported target format: {target_format}")
+
+    job_id = uuid.uuid4().hex
+    job_dir = JOBS_DIR / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    input_path = job_dir / Path(file.filename).name
+    try:
+        upload = await save_upload(file, input_path, allowed_kinds=allowed_kinds)
+        await run_in_threadpool(enqueue_job, job_id, input_path, file.filename, upload.kind, target_format)
+    except Exception:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    logging.info("Queued conversion job %s (%s -> %s)", job_id, upload.kind, target_format)
+    return {"job_id": job_id, "state": "queued", "status_url": f"{jobs_router.prefix}/{job_id}"}
+
+
+@jobs_router.get("/{job_id}")
+def get_job_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+
+@jobs_router.get("/{job_id}/result")
+def get_job_result(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["state"] == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job.get('error', 'unknown error')}")
+    if job["state"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is not finished yet (state: {job['state']})")
+
+    result_path = Path(job["result_path"])
+    if not result_path.exists():
+        raise HTTPException(status_code=410, detail="Job result is no longer available")
+    _, media_type = LIBREOFFICE_CONVERSIONS[(job["source_kind"], job["target_format"])]
+    filename = f"{Path(job['filename']).stem}.{job['target_format']}"
+    return FileResponse(
+        path=result_path,
+        media_type=media_type,
+        filename=filename,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -0,0 +1,520 @@
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+from metrics import converter_crashes, converter_timeouts
+from page_ranges import parse_page_range, slice_pdf
+from watchdog import LIBREOFFICE_TIMEOUT, Deadline, conversion_timeout, kill_process_group
+
+# Pool configuration (overridable through the environment)
+LIBREOFFICE_BINARY = os.environ.get("LIBREOFFICE_BINARY", "soffice")
+LIBREOFFICE_POOL_SIZE = int(os.environ.get("LIBREOFFICE_POOL_SIZE", "2"))
+LIBREOFFICE_MAX_JOBS = int(os.environ.get("LIBREOFFICE_MAX_JOBS", "200"))  # Restart an instance after this many jobs
+LIBREOFFICE_START_TIMEOUT = float(os.environ.get("LIBREOFFICE_START_TIMEOUT", "30"))
+LIBREOFFICE_ACQUIRE_TIMEOUT = float(os.environ.get("LIBREOFFICE_ACQUIRE_TIMEOUT", "300"))
+LIBREOFFICE_PROFILE_ROOT = Path(
+    os.environ.get("LIBREOFFICE_PROFILE_ROOT", Path(tempfile.gettempdir()) / "lo_profiles")
+)
+JSON_FILTER_DATA_VERSION = (7, 4)  # First release reading JSON filter data from --convert-to
+
+# Export filters used when a target is given without an explicit filter (e.g. "pdf", "docx")
+WRITER_EXPORT_FILTERS = {
+    "pdf": "writer_pdf_Export",
+    "docx": "MS Word 2007 XML",
+    "html": "HTML (StarWriter)",
+}
+
+# Import filters forced for some source types so they open in Writer rather than Draw
+IMPORT_FILTERS = {
+    ".pdf": "writer_pdf_import",
+}
+
+# (source kind, target format) -> (--convert-to spec, media type of the result)
+LIBREOFFICE_CONVERSIONS = {
+    ("docx", "pdf"): ("pdf", "application/pdf"),
+    ("docx", "html"): ("html:HTML:EmbedImages", "text/html"),
+    ("pdf", "docx"): ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    ("pdf", "html"): ("html:HTML:EmbedImages", "text/html"),
+}
+
+
+class ConversionError(Exception):
+    """Raised when a converter (LibreOffice, Spire.Doc or the PDF text engine) fails to convert a document."""
+
+
+class ConverterCrashed(ConversionError):
+    """Raised when the converter process died mid-job (a converter failure, not a bad document)."""
+
+
+class ConverterUnavailable(ConversionError):
+    """Raised when no converter instance became free in time (a capacity problem, not a bad document)."""
+
+
+class ConversionTimeout(ConversionError):
+    """Raised when a conversion ran past its deadline and the converter process was killed."""
+
+
+def parse_convert_to(convert_to):
+    # Split a LibreOffice --convert-to spec ("html:HTML:EmbedImages") into extension, filter and options
+    parts = convert_to.split(":", 2)
+    extension = parts[0]
+    filter_name = parts[1] if len(parts) > 1 and parts[1] else WRITER_EXPORT_FILTERS.get(extension)
+    filter_options = parts[2] if len(parts) > 2 else ""
+    return extension, filter_name, filter_options
+
+
+def pdf_page_range_spec(page_range):
+    # --convert-to spec exporting only the given pages ("1-3,5"), as JSON filter data (one-off runs of
+    # LibreOffice before 7.4 ignore it and slice the full export instead)
+    return "pdf:writer_pdf_Export:" + json.dumps({"PageRange": {"type": "string", "value": page_range}})
+
+
+@lru_cache(maxsize=1)
+def cold_libreoffice_version():
+    # (major, minor) of the libreoffice binary used for one-off runs, None when it cannot be told
+    try:
+        output = subprocess.run(["libreoffice", "--version"], capture_output=True, text=True, timeout=60).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning("Could not read the LibreOffice version: %s", e)
+        return None
+    match = re.search(r"LibreOffice (\d+)\.(\d+)", output)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def _uno_properties(**kwargs):
+    import uno  # Provided by LibreOffice (python3-uno), only needed when the pool is enabled
+
+    properties = []
+    for name, value in kwargs.items():
+        prop = uno.createUnoStruct("com.sun.star.beans.PropertyValue")
+        prop.Name = name
+        prop.Value = value
+        properties.append(prop)
+    return tuple(properties)
+
+
+class LibreOfficeWorker:
+    """A long-lived soffice instance with its own profile, listening on a named UNO pipe."""
+
+    def __init__(self, index):
+        self.index = index
+        # Pipe and profile names carry the pid so several gunicorn workers can each run a pool
+        self.pipe_name = f"lo_pool_{os.getpid()}_{index}"
+        self.profile_dir = LIBREOFFICE_PROFILE_ROOT / self.pipe_name
+        self.process = None
+        self.desktop = None
+        self.jobs_done = 0
+
+    def start(self):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        command = [
+            LIBREOFFICE_BINARY,
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--nodefault",
+            "--norestore",
+            "--nolockcheck",
+            f"-env:UserInstallation={self.profile_dir.resolve().as_uri()}",
+            f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+        ]
+        logging.debug("Starting LibreOffice worker %s on pipe %s", self.index, self.pipe_name)
+        self.jobs_done = 0
+        try:
+            # Own session, so the watchdog can kill soffice together with everything it spawned
+            self.process = subprocess.Popen(
+                command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+            )
+            self.desktop = self._connect()
+        except BaseException as e:
+            self.stop()  # Do not leave a half-started soffice behind
+            if isinstance(e, Exception) and not isinstance(e, ConversionError):
+                # E.g. no soffice binary or no uno module: the converter is broken, not the document
+                converter_crashes.inc(converter="libreoffice")
+                raise ConverterCrashed(f"LibreOffice worker {self.index} could not start: {e}") from e
+            raise
+        logging.info("LibreOffice worker %s ready (pid %s)", self.index, self.process.pid)
+
+    def _connect(self):
+        import uno
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        url = f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"
+        deadline = time.monotonic() + LIBREOFFICE_START_TIMEOUT
+        while True:
+            if self.process.poll() is not None:
+                converter_crashes.inc(converter="libreoffice")
+                raise ConverterCrashed(f"LibreOffice worker {self.index} exited during startup")
+            try:
+                context = resolver.resolve(url)
+                return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+            except Exception:
+                if time.monotonic() > deadline:
+                    converter_timeouts.inc(converter="libreoffice", reason="start")
+                    raise ConverterCrashed(f"LibreOffice worker {self.index} did not start in time")
+                time.sleep(0.25)
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass  # The instance may already be gone
+            self.desktop = None
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+        if self.process is not None:
+            kill_process_group(self.process)  # Also takes down children that outlived the launcher
+        self.process = None
+
+    def kill(self):
+        # Called from the watchdog timer: abort whatever the instance is doing; the UNO call then fails
+        if self.process is not None:
+            kill_process_group(self.process)
+
+    def restart(self):
+        self.stop()
+        # Drop the profile so a corrupted instance does not poison its replacement
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.start()
+
+    def is_healthy(self):
+        if self.process is None or self.process.poll() is not None or self.desktop is None:
+            return False
+        try:
+            self.desktop.getComponents()  # Cheap round-trip over the bridge
+            return True
+        except Exception:
+            return False
+
+    def load(self, src_path):
+        src_path = Path(src_path)
+        load_props = {"Hidden": True}
+        import_filter = IMPORT_FILTERS.get(src_path.suffix.lower())
+        if import_filter:
+            load_props["FilterName"] = import_filter
+
+        document = self.desktop.loadComponentFromURL(
+            src_path.resolve().as_uri(), "_blank", 0, _uno_properties(**load_props)
+        )
+        if document is None:
+            raise ConversionError(f"LibreOffice could not load {src_path.name}")
+        return document
+
+    def store(self, document, out_stem, outdir, convert_to):
+        extension, filter_name, filter_options = parse_convert_to(convert_to)
+        out_path = Path(outdir) / f"{out_stem}.{extension}"
+        store_props = {"FilterName": filter_name, "Overwrite": True}
+        url = out_path.resolve().as_uri()
+        if filter_options.startswith("{"):
+            # JSON filter data, as on the command line: {"PageRange": {"type": "string", "value": "1-3"}}
+            import uno
+
+            filter_data = {name: option["value"] for name, option in json.loads(filter_options).items()}
+            store_props["FilterData"] = uno.Any("[]com.sun.star.beans.PropertyValue", _uno_properties(**filter_data))
+            # A property holding an Any has to go through uno.invoke to keep its declared type
+            uno.invoke(document, "storeToURL", (url, uno.Any("[]com.sun.star.beans.PropertyValue", _uno_properties(**store_props))))
+            return out_path
+        if filter_options:
+            store_props["FilterOptions"] = filter_options
+        document.storeToURL(url, _uno_properties(**store_props))
+        return out_path
+
+    def convert(self, src_path, outdir, convert_to):
+        document = self.load(src_path)
+        try:
+            out_path = self.store(document, Path(src_path).stem, outdir, convert_to)
+        finally:
+            document.close(True)
+        self.jobs_done += 1
+        return out_path
+
+
+def _guarded(worker, fn, *args, timeout=LIBREOFFICE_TIMEOUT):
+    # Run a call against a worker under a deadline, restarting the instance when it hangs or the bridge fails
+    deadline = Deadline(timeout, worker.kill)
+    try:
+        with deadline:
+            return fn(*args)
+    except Exception as e:
+        if deadline.expired:
+            logging.error("LibreOffice worker %s exceeded its %ss deadline and was killed", worker.index, timeout)
+            converter_timeouts.inc(converter="libreoffice", reason="deadline")
+            worker.restart()
+            raise ConversionTimeout(f"LibreOffice did not finish within {timeout:g}s")
+        if isinstance(e, ConversionError):
+            raise
+        # A bridge failure usually means soffice crashed mid-job
+        logging.error("LibreOffice worker %s failed: %s", worker.index, e)
+        converter_crashes.inc(converter="libreoffice")
+        worker.restart()
+        raise ConverterCrashed(f"LibreOffice worker crashed: {e}")
+
+
+class LibreOfficeSession:
+    """A borrowed worker for a chain of conversions: each document is imported once and exported as often as needed."""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self._documents = []
+
+    def load(self, src_path):
+        document = _guarded(self.worker, self.worker.load, src_path)
+        self._documents.append(document)
+        return Path(src_path), document
+
+    def store(self, loaded, outdir, convert_to):
+        src_path, document = loaded
+        return _guarded(
+            self.worker, self.worker.store, document, src_path.stem, outdir, convert_to,
+            timeout=conversion_timeout(convert_to),
+        )
+
+    def close(self):
+        for document in self._documents:
+            try:
+                document.close(True)
+            except Exception:
+                pass  # Gone with a crashed instance
+        self._documents.clear()
+        self.worker.jobs_done += 1
+
+
+class ColdLibreOfficeSession:
+    """Session stand-in without a pool: every export is a one-off headless run on the source file."""
+
+    def load(self, src_path):
+        return Path(src_path), None
+
+    def store(self, loaded, outdir, convert_to):
+        src_path, _ = loaded
+        return LibreOfficePool._convert_cold(src_path, outdir, convert_to)
+
+    def close(self):
+        pass
+
+
+class LibreOfficePool:
+    """Pool of warm LibreOffice workers; each job borrows one instance for the duration of a conversion."""
+
+    def __init__(self, size=LIBREOFFICE_POOL_SIZE, max_jobs=LIBREOFFICE_MAX_JOBS):
+        self.size = size
+        self.max_jobs = max_jobs
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._uno_available = None
+
+    @property
+    def enabled(self):
+        return self.size > 0 and self._has_uno()
+
+    def _has_uno(self):
+        # python3-uno is built for one interpreter only (the system python3 on Debian/Ubuntu)
+        if self._uno_available is None:
+            try:
+                import uno  # noqa: F401
+                self._uno_available = True
+            except ImportError as e:
+                logging.warning("LibreOffice pool disabled, this Python cannot import uno (%s): "
+                                "converting with one-off LibreOffice runs instead", e)
+                self._uno_available = False
+        return self._uno_available
+
+    @property
+    def idle_workers(self):
+        return self._idle.qsize()
+
+    def start(self):
+        with self._lock:
+            if self._started or not self.enabled:
+                return
+            try:
+                for index in range(self.size):
+                    worker = LibreOfficeWorker(index)
+                    worker.start()
+                    self._workers.append(worker)
+                    self._idle.put(worker)
+            except BaseException:
+                # All or nothing: the next start() reuses the same pipe names
+                self._stop_workers()
+                raise
+            self._started = True
+            logging.info("LibreOffice pool started with %s workers", self.size)
+
+    def _stop_workers(self):
+        # Caller holds the lock
+        for worker in self._workers:
+            worker.stop()
+            shutil.rmtree(worker.profile_dir, ignore_errors=True)
+        self._workers.clear()
+        self._idle = queue.Queue()
+        self._started = False
+
+    def shutdown(self):
+        with self._lock:
+            self._stop_workers()
+        logging.info("LibreOffice pool stopped")
+
+    @contextmanager
+    def _borrow(self):
+        # Hand out an idle, healthy worker and put it back (recycled if worn out) afterwards
+        self.start()
+        try:
+            worker = self._idle.get(timeout=LIBREOFFICE_ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            converter_timeouts.inc(converter="libreoffice", reason="acquire")
+            raise ConverterUnavailable("No LibreOffice worker became available in time")
+
+        try:
+            if not worker.is_healthy():
+                logging.warning("LibreOffice worker %s is unhealthy, restarting", worker.index)
+                converter_crashes.inc(converter="libreoffice")
+                worker.restart()
+            yield worker
+        finally:
+            self._recycle_if_worn(worker)
+            self._idle.put(worker)
+
+    def _recycle_if_worn(self, worker):
+        if worker.jobs_done >= self.max_jobs:
+            logging.debug("LibreOffice worker %s reached %s jobs, recycling", worker.index, worker.jobs_done)
+            try:
+                worker.restart()
+            except ConversionError as e:
+                logging.error("Failed to recycle LibreOffice worker %s: %s", worker.index, e)
+
+    def convert(self, src_path, outdir, convert_to):
+        # Without a pool, fall back to a one-off headless LibreOffice run
+        if not self.enabled:
+            return self._convert_cold(src_path, outdir, convert_to)
+
+        with self._borrow() as worker:
+            return _guarded(worker, worker.convert, src_path, outdir, convert_to, timeout=conversion_timeout(convert_to))
+
+    @contextmanager
+    def session(self):
+        """Borrow one instance for several loads/exports, closing the loaded documents afterwards."""
+        if not self.enabled:
+            yield ColdLibreOfficeSession()
+            return
+
+        with self._borrow() as worker:
+            session = LibreOfficeSession(worker)
+            try:
+                yield session
+            finally:
+                session.close()
+
+    def convert_many(self, sources, outdir, convert_to):
+        """Convert several files in one LibreOffice session, yielding (source, output path, error) as each finishes."""
+        if not self.enabled:
+            yield from self._convert_many_cold(sources, outdir, convert_to)
+            return
+
+        timeout = conversion_timeout(convert_to)
+        with self._borrow() as worker:
+            for src_path in sources:
+                try:
+                    yield src_path, _guarded(worker, worker.convert, src_path, outdir, convert_to, timeout=timeout), None
+                except ConversionError as e:
+                    logging.error("Batch conversion of %s failed: %s", src_path, e)
+                    yield src_path, None, str(e)
+                self._recycle_if_worn(worker)
+
+    @staticmethod
+    def _run_cold(command, timeout):
+        # One-off headless run in its own session; past the deadline the whole process tree is killed
+        try:
+            process = subprocess.Popen(command, start_new_session=True)
+        except OSError as e:
+            converter_crashes.inc(converter="libreoffice")
+            raise ConverterCrashed(f"Could not run LibreOffice: {e}") from e
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_group(process)
+            converter_timeouts.inc(converter="libreoffice", reason="deadline")
+            raise ConversionTimeout(f"LibreOffice did not finish within {timeout:g}s")
+        if returncode < 0:
+            converter_crashes.inc(converter="libreoffice")
+            raise ConverterCrashed(str(subprocess.CalledProcessError(returncode, command)))
+        if returncode != 0:
+            raise ConversionError(str(subprocess.CalledProcessError(returncode, command)))
+
+    @staticmethod
+    def _convert_cold(src_path, outdir, convert_to):
+        extension, _, filter_options = parse_convert_to(convert_to)
+        page_range = None
+        if filter_options.startswith("{") and (cold_libreoffice_version() or (0, 0)) < JSON_FILTER_DATA_VERSION:
+            # Older releases ignore the JSON filter data: export every page, then keep the requested ones
+            page_range = json.loads(filter_options)["PageRange"]["value"]
+            convert_to = extension
+        LibreOfficePool._run_cold(
+            [
+                "libreoffice",
+                "--headless",
+                "--convert-to", convert_to,
+                "--outdir", str(outdir),
+                str(src_path),
+            ],
+            conversion_timeout(convert_to),
+        )
+        out_path = Path(outdir) / f"{Path(src_path).stem}.{extension}"
+        if page_range and out_path.exists():
+            full_path = out_path.with_name(f"{out_path.stem}.all-pages{out_path.suffix}")
+            out_path.rename(full_path)
+            try:
+                slice_pdf(full_path, out_path, parse_page_range(page_range))
+            except Exception as e:
+                raise ConversionError(f"Could not keep pages {page_range} of the export: {e}")
+            finally:
+                full_path.unlink()
+        return out_path
+
+    @staticmethod
+    def _convert_many_cold(sources, outdir, convert_to):
+        # A single headless run accepts many input files and converts them one after another
+        extension, _, _ = parse_convert_to(convert_to)
+        error = None
+        try:
+            LibreOfficePool._run_cold(
+                [
+                    "libreoffice",
+                    "--headless",
+                    "--convert-to", convert_to,
+                    "--outdir", str(outdir),
+                    *[str(src_path) for src_path in sources],
+                ],
+                conversion_timeout(convert_to) * len(sources),
+            )
+        except ConversionError as e:
+            error = str(e)
+        for src_path in sources:
+            out_path = Path(outdir) / f"{Path(src_path).stem}.{extension}"
+            if out_path.exists():
+                yield src_path, out_path, None
+            else:
+                yield src_path, None, error or "LibreOffice produced no output"
+
+
+# Shared pool used by the API routes
+lo_pool = LibreOfficePool()
@@ -0,0 +1,319 @@
+import contextvars
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+# Latency buckets in seconds, from cache hits up to slow multi-minute conversions
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Conversion cost buckets in page equivalents, around the fast/bulk lane threshold
+COST_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time, so it never goes stale.
+
+    With labels, the callback returns a dict mapping label value tuples to values.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, read, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        if not self.labelnames:
+            yield self.name, "", self.read()
+            return
+        for key, value in sorted(self.read().items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}  # label values -> (bucket counts, sum)
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            counts, total = self._series.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._series[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, key, [("le", _format_value(bound))]), count
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), counts[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, read, labelnames=()):
+        return self.register(Gauge(name, documentation, read, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Metrics of this process (each gunicorn worker keeps and serves its own)
+registry = Registry()
+stage_seconds = registry.register(Histogram(
+    "conversion_stage_seconds", "Time spent in each stage of a request.", ["route", "formats", "stage", "outcome"]
+))
+requests_total = registry.register(Counter(
+    "conversion_requests_total", "Requests handled, by outcome.", ["route", "formats", "outcome"]
+))
+request_bytes = registry.register(Counter(
+    "conversion_request_bytes_total", "Request body bytes received.", ["route", "formats"]
+))
+response_bytes = registry.register(Counter(
+    "conversion_response_bytes_total", "Response body bytes sent.", ["route", "formats"]
+))
+converter_crashes = registry.register(Counter(
+    "converter_crashes_total", "Converter processes that died or had to be restarted mid-job.", ["converter"]
+))
+converter_timeouts = registry.register(Counter(
+    "converter_timeouts_total", "Converter operations that ran out of time.", ["converter", "reason"]
+))
+lane_admissions = registry.register(Counter(
+    "conversion_lane_admissions_total", "Conversions admitted or refused by each lane, by result.", ["lane", "result"]
+))
+lane_wait_seconds = registry.register(Histogram(
+    "conversion_lane_wait_seconds", "Time admitted conversions waited for a thread of their lane.", ["lane"]
+))
+conversion_cost = registry.register(Histogram(
+    "conversion_cost_pages", "Estimated cost of conversions in page equivalents, by the lane it chose.", ["lane"],
+    buckets=COST_BUCKETS,
+))
+single_flight_events = registry.register(Counter(
+    "single_flight_events_total",
+    "Duplicate conversions coalesced and lock handovers, by event.",
+    ["event"],
+))
+html_assets = registry.register(Counter(
+    "html_assets_total", "Embedded images moved out of converted HTML, by whether the asset already existed.", ["result"]
+))
+
+
+class RequestMetrics:
+    """Per-request stage timings and labels, collected while the request is handled."""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.formats = "none"
+        self.outcome = None
+        self.stages = {}  # stage name -> seconds, in the order first seen
+
+    def record(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self):
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items())
+
+
+_current_request = contextvars.ContextVar("request_metrics", default=None)
+
+
+def current_request():
+    return _current_request.get()
+
+
+def record_stage(stage, seconds):
+    request = _current_request.get()
+    if request is not None:
+        request.record(stage, seconds)
+
+
+def set_formats(source, target):
+    # Label the request's metrics with its format pair, e.g. "docx->pdf"
+    request = _current_request.get()
+    if request is not None:
+        request.formats = f"{source}->{target}"
+
+
+def set_outcome(outcome):
+    # Override the outcome derived from the status code, e.g. for cache hits
+    request = _current_request.get()
+    if request is not None:
+        request.outcome = outcome
+
+
+class timed_stage:
+    """Context manager recording the wall time of the enclosed block as a stage of the current request."""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_stage(self.stage, time.perf_counter() - self._started)
+
+
+def timed_iter(iterable, stage):
+    # Record the time spent producing a streamed body; the request is captured now, as iteration runs later
+    request = _current_request.get()
+    elapsed = 0.0
+    iterator = iter(iterable)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - started
+            yield chunk
+    finally:
+        if request is not None:
+            request.record(stage, elapsed)
+
+
+def _outcome_for_status(status):
+    if status is None or status >= 500:
+        return "busy" if status == 503 else "error"
+    if status >= 400:
+        return "rejected"
+    return "success"
+
+
+class RequestMetricsMiddleware:
+    """Gives each request an id and stage timings: echoed as X-Request-ID and Server-Timing, observed in the metrics."""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        request = RequestMetrics(request_id)
+        token = _current_request.set(request)
+        started = time.perf_counter()
+        receive_started = None
+        status = None
+        bytes_in = 0
+        bytes_out = 0
+
+        async def receive_wrapper():
+            nonlocal bytes_in, receive_started
+            message = await receive()
+            if message["type"] == "http.request":
+                if receive_started is None:
+                    receive_started = time.perf_counter()
+                bytes_in += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    request.record("receive", time.perf_counter() - receive_started)
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status, bytes_out
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                request.record("handler", time.perf_counter() - started)
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                headers.append((b"server-timing", request.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                bytes_out += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            request.record("total", time.perf_counter() - started)
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            outcome = request.outcome if request.outcome and status and status < 400 else _outcome_for_status(status)
+            for stage, seconds in request.stages.items():
+                stage_seconds.observe(seconds, route=route, formats=request.formats, stage=stage, outcome=outcome)
+            requests_total.inc(route=route, formats=request.formats, outcome=outcome)
+            request_bytes.inc(bytes_in, route=route, formats=request.formats)
+            response_bytes.inc(bytes_out, route=route, formats=request.formats)
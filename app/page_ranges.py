@@ -0,0 +1,52 @@
+import os
+
+# Largest "first N pages" preview accepted by the API
+PREVIEW_MAX_PAGES = int(os.environ.get("PREVIEW_MAX_PAGES", "10"))
+PAGE_RANGE_PATTERN = r"^\d+(-\d+)?(,\d+(-\d+)?)*$"
+
+
+def parse_page_range(spec):
+    """Parse "1-3,5" into sorted, merged (first, last) 1-based page intervals; raises ValueError."""
+    intervals = []
+    for part in spec.split(","):
+        first, _, last = part.strip().partition("-")
+        first = int(first)
+        last = int(last) if last else first
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range: {part}")
+        intervals.append((first, last))
+
+    merged = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(last, merged[-1][1]))
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def format_page_range(intervals):
+    # Canonical form ("1-3,5"), so equivalent requests share a cache entry
+    return ",".join(f"{first}-{last}" if first != last else str(first) for first, last in intervals)
+
+
+def page_indices(intervals, page_count):
+    # 0-based indices of the selected pages that exist in a document of ``page_count`` pages
+    return [index for first, last in intervals for index in range(first - 1, min(last, page_count))]
+
+
+def slice_pdf(src_path, dest_path, intervals):
+    """Write only the selected pages of ``src_path`` to ``dest_path``; returns the number of pages kept."""
+    import PyPDF2
+
+    with open(src_path, "rb") as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        indices = page_indices(intervals, len(pdf_reader.pages))
+        if not indices:
+            raise ValueError(f"The document has only {len(pdf_reader.pages)} pages")
+        pdf_writer = PyPDF2.PdfWriter()
+        for index in indices:
+            pdf_writer.add_page(pdf_reader.pages[index])
+        with open(dest_path, "wb") as out:
+            pdf_writer.write(out)
+    return len(indices)
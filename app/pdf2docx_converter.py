@@ -1,6 +1,158 @@
-import PyPDF2
-from docx import Document
+import functools
+import io
+import logging
+import multiprocessing
 import os
+import re
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from libreoffice_pool import ConversionError, ConverterCrashed
+from metrics import converter_crashes
+
+# Engine configuration (overridable through the environment)
+PDF_TEXT_POOL_SIZE = int(os.environ.get("PDF_TEXT_POOL_SIZE", str(min(os.cpu_count() or 1, 4))))
+PDF_TEXT_CHUNK_PAGES = int(os.environ.get("PDF_TEXT_CHUNK_PAGES", "16"))  # Pages extracted per pool task
+PDF_TEXT_CHUNKS_AHEAD = 2  # Chunks in flight per worker; bounds how much extracted text waits to be written
+
+# Characters XML 1.0 does not allow, which PDF text extraction regularly produces
+INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _extract_pages(pdf_path, start, stop):
+    # Runs in a pool process: each task opens the PDF itself, so only page numbers and text cross processes
+    import PyPDF2
+
+    with open(pdf_path, "rb") as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        return [pdf_reader.pages[page_num].extract_text() or "" for page_num in range(start, stop)]
+
+
+def count_pages(pdf_path):
+    import PyPDF2
+
+    with open(pdf_path, "rb") as pdf_file:
+        return len(PyPDF2.PdfReader(pdf_file).pages)
+
+
+@functools.lru_cache(maxsize=1)
+def _docx_template():
+    # python-docx's blank document supplies styles, settings and the section layout of the output
+    from docx import Document
+
+    buffer = io.BytesIO()
+    Document().save(buffer)
+    return buffer.getvalue()
+
+
+def _page_paragraphs(text):
+    # Same layout as before: the page text in one paragraph (line breaks kept), then an empty paragraph
+    lines = INVALID_XML_CHARS.sub("", text).split("\n")
+    runs = "<w:br/>".join(f'<w:t xml:space="preserve">{escape(line)}</w:t>' for line in lines)
+    return f"<w:p><w:r>{runs}</w:r></w:p><w:p/>"
+
+
+def write_docx(pages, docx_path):
+    """Write the page texts from the ``pages`` iterable to ``docx_path`` as they arrive; returns the page count.
+
+    ``word/document.xml`` is streamed into the archive, so memory does not grow with the page count.
+    """
+    written = 0
+    empty = []
+    with zipfile.ZipFile(io.BytesIO(_docx_template())) as template, \
+            zipfile.ZipFile(docx_path, "w", zipfile.ZIP_DEFLATED) as docx:
+        document = template.read("word/document.xml").decode("utf-8")
+        body_start = document.index("<w:body>") + len("<w:body>")
+        section_start = document.index("<w:sectPr", body_start)
+        for item in template.infolist():
+            if item.filename != "word/document.xml":
+                docx.writestr(item, template.read(item.filename))
+
+        with docx.open("word/document.xml", "w", force_zip64=True) as out:
+            out.write(document[:body_start].encode("utf-8"))
+            for page_num, text in enumerate(pages, start=1):
+                written += 1
+                if text.strip():
+                    out.write(_page_paragraphs(text).encode("utf-8"))
+                else:
+                    empty.append(page_num)
+            out.write(document[section_start:].encode("utf-8"))
+    if empty:
+        logging.warning("No text found on %s of %s pages of %s", len(empty), written, docx_path)
+    return written
+
+
+class PdfTextEngine:
+    """Text-only PDF to DOCX conversion: page text is extracted in page-range chunks across a process
+    pool and written to the DOCX in page order as the chunks complete."""
+
+    def __init__(self, size=PDF_TEXT_POOL_SIZE, chunk_pages=PDF_TEXT_CHUNK_PAGES):
+        self.size = size
+        self.chunk_pages = chunk_pages
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _iter_pages(self, executor, pdf_path, page_count):
+        # Keep a bounded window of chunks in flight and yield their pages strictly in order
+        ranges = ((start, min(start + self.chunk_pages, page_count)) for start in range(0, page_count, self.chunk_pages))
+        pending = deque()
+        try:
+            for start, stop in ranges:
+                pending.append(executor.submit(_extract_pages, str(pdf_path), start, stop))
+                if len(pending) >= self.size * PDF_TEXT_CHUNKS_AHEAD:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def convert(self, pdf_path, docx_path):
+        """Convert ``pdf_path`` to a text-only ``docx_path``; raises ConversionError on failure."""
+        executor = self.start()
+        partial_path = Path(docx_path).with_suffix(".partial")
+        try:
+            page_count = count_pages(pdf_path)
+            written = write_docx(self._iter_pages(executor, pdf_path, page_count), partial_path)
+            partial_path.replace(docx_path)
+        except BrokenProcessPool as e:
+            logging.error("PDF text worker process crashed: %s", e)
+            converter_crashes.inc(converter="pdf_text")
+            with self._lock:
+                if self._executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+            raise ConverterCrashed(f"PDF text worker crashed: {e}")
+        except Exception as e:
+            raise ConversionError(f"PDF text extraction failed: {e}")
+        finally:
+            partial_path.unlink(missing_ok=True)
+        logging.debug("Extracted text of %s pages from %s", written, pdf_path)
+        return Path(docx_path)
+
+
+# Shared engine used by the API routes
+pdf_text_engine = PdfTextEngine()
+
 
 def pdf_to_docx(pdf_path, docx_path):
     # Check if the PDF file exists
@@ -9,36 +161,19 @@ def pdf_to_docx(pdf_path, docx_path):
         return
 
     try:
-        # Initialize a PDF reader object
-        with open(pdf_path, 'rb') as pdf_file:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            # Create a new DOCX document
-            doc = Document()
-
-            # Iterate through each page of the PDF
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text = page.extract_text()
-
-                # If there's any text on the page, add it to the DOCX document
-                if text:
-                    doc.add_paragraph(text)
-                    doc.add_paragraph("\n")  # Add a line break between pages
-                else:
-                    print(f"Warning: No text found on page {page_num + 1}")
-
-            # Save the DOCX file
-            doc.save(docx_path)
-        
+        pdf_text_engine.convert(pdf_path, docx_path)
         print(f"PDF converted to DOCX successfully: {docx_path}")
-
-    except Exception as e:
+    except ConversionError as e:
         print(f"Error during conversion: {e}")
 
 
-# Example Usage
-pdf_path = "GHC_Tools_new.pdf"  # Your input PDF file path
-docx_path = "GHC_Tools_new.docx"  # Desired output DOCX file path
+if __name__ == "__main__":
+    import sys
 
-pdf_to_docx(pdf_path, docx_path)
+    # Example usage: python pdf2docx_converter.py GHC_Tools_new.pdf GHC_Tools_new.docx
+    if len(sys.argv) != 3:
+        sys.exit("usage: pdf2docx_converter.py <input.pdf> <output.docx>")
+    try:
+        pdf_to_docx(sys.argv[1], sys.argv[2])
+    finally:
+        pdf_text_engine.shutdown()
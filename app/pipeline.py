@@ -0,0 +1,77 @@
+import logging
+import time
+
+from libreoffice_pool import lo_pool
+
+
+class Stage:
+    """One step of a conversion pipeline; ``fn(context)`` returns the value stored under ``name``."""
+
+    def __init__(self, name, fn, requires=()):
+        self.name = name
+        self.fn = fn
+        self.requires = tuple(requires)
+
+
+class Pipeline:
+    """Chain of conversion stages run inside a single LibreOffice session.
+
+    Only the stages needed for the requested outputs run; the per-stage wall time of
+    each run is returned so slow steps can be spotted.
+    """
+
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = list(stages)
+        self._by_name = {stage.name: stage for stage in self.stages}
+
+    def needed_stages(self, outputs):
+        # Walk the requirements back from the requested outputs
+        needed = set()
+        pending = list(outputs)
+        while pending:
+            name = pending.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+            pending.extend(self._by_name[name].requires)
+        return [stage for stage in self.stages if stage.name in needed]
+
+    def run(self, outputs, **context):
+        """Run the stages producing ``outputs``; returns (context with every stage result, timings in seconds)."""
+        timings = {}
+        stages = self.needed_stages(outputs)
+        skipped = [stage.name for stage in self.stages if stage not in stages]
+        if skipped:
+            logging.debug("%s pipeline skipping unneeded stages: %s", self.name, ", ".join(skipped))
+
+        with lo_pool.session() as session:
+            context["session"] = session
+            for stage in stages:
+                started = time.perf_counter()
+                context[stage.name] = stage.fn(context)
+                timings[stage.name] = time.perf_counter() - started
+        logging.debug(
+            "%s pipeline stage timings: %s",
+            self.name, ", ".join(f"{name}={seconds:.3f}s" for name, seconds in timings.items()),
+        )
+        return context, timings
+
+
+def import_source(context):
+    return context["session"].load(context["source"])
+
+
+def exporter(convert_to):
+    # Stage function exporting the imported document with the given --convert-to spec
+    def export(context):
+        return context["session"].store(context["import"], context["outdir"], convert_to)
+    return export
+
+
+# PDF -> HTML; the DOCX export is available but only runs when a caller asks for it
+PDF2HTML_PIPELINE = Pipeline("pdf2html", [
+    Stage("import", import_source),
+    Stage("docx", exporter("docx"), requires=["import"]),
+    Stage("html", exporter("html:HTML:EmbedImages"), requires=["import"]),
+])
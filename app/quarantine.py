@@ -0,0 +1,65 @@
+import logging
+import os
+import time
+
+import redis
+
+from redis_conn import redis_client
+
+# Quarantine configuration (overridable through the environment)
+QUARANTINE_AFTER_TIMEOUTS = int(os.environ.get("QUARANTINE_AFTER_TIMEOUTS", "2"))  # 0 disables the quarantine
+QUARANTINE_TTL = int(os.environ.get("QUARANTINE_TTL", str(24 * 3600)))  # Seconds a document stays quarantined
+QUARANTINE_REDIS_BACKOFF = 30  # Seconds the quarantine is skipped after a Redis error
+QUARANTINE_KEY_PREFIX = "conversion_quarantine:"
+
+
+class Quarantine:
+    """Counts conversion timeouts per document content hash in Redis, shared by every API process.
+
+    A document that timed out ``after_timeouts`` times is refused until its entry expires, so retries of
+    a pathological file do not keep eating conversion capacity. Redis errors never block a conversion:
+    after one, the quarantine is skipped for a while instead of every request waiting on Redis retries.
+    """
+
+    def __init__(self, client, after_timeouts=QUARANTINE_AFTER_TIMEOUTS, ttl=QUARANTINE_TTL):
+        self.client = client
+        self.after_timeouts = after_timeouts
+        self.ttl = ttl
+        self._skip_until = 0.0
+
+    @property
+    def active(self):
+        return bool(self.after_timeouts) and time.monotonic() >= self._skip_until
+
+    def _redis_failed(self, action, e):
+        logging.warning("Could not %s, skipping the quarantine for %ss: %s", action, QUARANTINE_REDIS_BACKOFF, e)
+        self._skip_until = time.monotonic() + QUARANTINE_REDIS_BACKOFF
+
+    def is_quarantined(self, content_hash):
+        if not self.active:
+            return False
+        try:
+            timeouts = self.client.get(QUARANTINE_KEY_PREFIX + content_hash)
+        except redis.exceptions.RedisError as e:
+            self._redis_failed("check the conversion quarantine", e)
+            return False
+        return int(timeouts or 0) >= self.after_timeouts
+
+    def record_timeout(self, content_hash):
+        if not self.active:
+            return
+        key = QUARANTINE_KEY_PREFIX + content_hash
+        try:
+            pipe = self.client.pipeline()
+            pipe.incr(key)
+            pipe.expire(key, self.ttl)
+            timeouts, _ = pipe.execute()
+        except redis.exceptions.RedisError as e:
+            self._redis_failed("record a conversion timeout", e)
+            return
+        if timeouts == self.after_timeouts:
+            logging.warning("Quarantined document %s after %s conversion timeouts", content_hash, timeouts)
+
+
+# Shared quarantine used by the API routes
+quarantine = Quarantine(redis_client)
@@ -0,0 +1,14 @@
+import os
+
+import redis
+
+# Redis connection settings (overridable through the environment, defaults match the Docker Redis service)
+REDIS_HOST = os.environ.get("REDIS_HOST", "172.16.117.47")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", "6379"))
+REDIS_DB = int(os.environ.get("REDIS_DB", "0"))
+
+# Set up Redis client (use redis.Redis instead of redis.StrictRedis)
+redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True, socket_timeout=30)
+
+# Same server without response decoding, for values holding file bytes
+redis_binary_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, socket_timeout=30)
@@ -0,0 +1,139 @@
+import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+import redis
+
+# Log shipping configuration (overridable through the environment)
+LOG_LIST_KEY = "app_logs"
+LOG_BUFFER_SIZE = int(os.environ.get("LOG_BUFFER_SIZE", "10000"))  # Records held in memory before new ones are dropped
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", "500"))
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", "0.5"))  # Seconds between flushes of a partial batch
+LOG_MAX_ENTRIES = int(os.environ.get("LOG_MAX_ENTRIES", "10000"))  # Entries kept in Redis, older ones are trimmed
+
+LOG_LEVEL_PATTERN = re.compile(r" - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - ")
+
+
+class RedisHandler(logging.Handler):
+    """Ships log records to a Redis list from a background thread, in pipelined batches.
+
+    ``emit`` only formats the record and puts it on a bounded in-memory queue, so logging
+    never waits on Redis; when the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, client, key=LOG_LIST_KEY, buffer_size=LOG_BUFFER_SIZE, batch_size=LOG_BATCH_SIZE,
+                 flush_interval=LOG_FLUSH_INTERVAL, max_entries=LOG_MAX_ENTRIES):
+        super().__init__()
+        self.client = client
+        self.key = key
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=buffer_size)
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # Records emitted before this are buffered; nothing talks to Redis until the app starts serving
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._flush_loop, name="redis-log-shipper", daemon=True)
+            self._thread.start()
+
+    def emit(self, record):
+        try:
+            self._queue.put_nowait(self.format(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def _next_batch(self):
+        # Wait for a first record, then collect more until the batch is full or the interval is over
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _ship(self, batch):
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.lpush(self.key, *batch)  # Newest entry ends up first, as with one LPUSH per record
+            pipe.ltrim(self.key, 0, self.max_entries - 1)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            # Logging the failure through logging would feed it straight back into this handler
+            self.failed += len(batch)
+            print(f"Failed to send {len(batch)} log records to Redis: {e}", file=sys.stderr)
+
+    def _flush_loop(self):
+        while not self._stopping.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._ship(batch)
+
+    def flush(self):
+        # Ship whatever is buffered right now (used at shutdown)
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._ship(batch)
+                batch = []
+        if batch:
+            self._ship(batch)
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+        super().close()
+
+
+def read_logs(client, page=1, page_size=50, min_level=None, key=LOG_LIST_KEY, scan_size=1000):
+    """Return one page of log entries, newest page first and oldest-to-newest within the page."""
+    start = (page - 1) * page_size
+    if min_level is None:
+        logs = client.lrange(key, start, start + page_size - 1)
+    else:
+        # Walk the list in windows, keeping entries at or above the requested level
+        threshold = logging.getLevelName(min_level)
+        logs = []
+        skipped = 0
+        offset = 0
+        while len(logs) < page_size:
+            window = client.lrange(key, offset, offset + scan_size - 1)
+            if not window:
+                break
+            offset += len(window)
+            for entry in window:
+                match = LOG_LEVEL_PATTERN.search(entry)
+                if not match or logging.getLevelName(match.group(1)) < threshold:
+                    continue
+                if skipped < start:
+                    skipped += 1
+                    continue
+                logs.append(entry)
+                if len(logs) == page_size:
+                    break
+    logs.reverse()  # Redis stores logs in reverse order
+    return logs
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+# Cache configuration (overridable through the environment)
+RESULT_CACHE_DIR = Path(os.environ.get("RESULT_CACHE_DIR", "cache"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))  # 0 disables the cache
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "0"))  # Seconds, 0 means entries never expire
+RESULT_CACHE_PIN_MAX_AGE = 3600  # Seconds after which a pin whose response never finished stops protecting its entry
+
+
+def make_cache_key(content_hash, target_format, export_options=""):
+    # Same bytes converted with different settings must not share an entry
+    return hashlib.sha256(f"{content_hash}|{target_format}|{export_options}".encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed store of conversion outputs on local disk, bounded in bytes with LRU eviction.
+
+    Each process keeps its own index; entries another process sharing the directory stored are
+    picked up from disk on a miss. Entries pinned by ``get(key, pin=True)`` are not evicted until
+    ``unpin()``, so a response can still read them.
+    """
+
+    def __init__(self, root=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES, ttl=RESULT_CACHE_TTL):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (size in bytes, creation time), least recently used first
+        self._total_bytes = 0
+        self._pins = {}  # key -> (responses reading the entry, time of the latest pin)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def load(self):
+        # Rebuild the index from disk, oldest access first, so a restart keeps the warm entries
+        if not self.enabled:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for entry_dir in self.root.iterdir():
+            if entry_dir.name.startswith(".staging-"):
+                shutil.rmtree(entry_dir, ignore_errors=True)  # Left behind by an interrupted put()
+                continue
+            if not entry_dir.is_dir():
+                continue
+            stat = entry_dir.stat()
+            size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+            entries.append((stat.st_atime, entry_dir.name, size, stat.st_mtime))
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            for _, key, size, created in sorted(entries):
+                self._entries[key] = (size, created)
+                self._total_bytes += size
+        logging.info("Result cache loaded %s entries (%s bytes) from %s", len(self._entries), self._total_bytes, self.root)
+
+    def get(self, key, pin=False):
+        """Return the cached output files for ``key``, or None on a miss; with ``pin`` the entry stays
+        until ``unpin(key)``."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry[1] > self.ttl:
+                if not self._pinned(key):
+                    self._remove(key)
+                entry = None
+            if entry is None:
+                entry = self._adopt(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            if pin:
+                count, _ = self._pins.get(key, (0, 0))
+                self._pins[key] = (count + 1, time.monotonic())
+        try:
+            files = sorted(f for f in (self.root / key).iterdir() if f.is_file())
+        except FileNotFoundError:
+            files = None  # Removed by another process sharing the directory
+        if pin and not files:
+            self.unpin(key)
+        return files or None
+
+    def unpin(self, key):
+        # The response reading the entry is done; evict whatever was kept over the limit for it
+        with self._lock:
+            count, pinned_at = self._pins.pop(key, (1, 0))
+            if count > 1:
+                self._pins[key] = (count - 1, pinned_at)
+            self._evict()
+
+    def put(self, key, files):
+        """Move ``files`` into the cache under ``key`` and return the paths to serve them from."""
+        if not self.enabled:
+            return list(files)
+        # Build the entry next to the cache, then rename it into place so readers never see it half written
+        staging = self.root / f".staging-{uuid.uuid4().hex}"
+        size = sum(Path(src).stat().st_size for src in files)
+        if size > self.max_bytes:
+            return list(files)
+        staging.mkdir(parents=True)
+        for src in files:
+            shutil.move(str(src), staging / Path(src).name)  # A rename when the cache shares the uploads filesystem
+
+        entry_dir = self.root / key
+        with self._lock:
+            if key in self._entries:
+                # Another request stored the same result first
+                self._entries.move_to_end(key)
+                shutil.rmtree(staging, ignore_errors=True)
+            else:
+                try:
+                    staging.rename(entry_dir)
+                    self._entries[key] = (size, time.time())
+                    self._total_bytes += size
+                except OSError:
+                    # Another process sharing the cache directory stored the same result first
+                    if self._adopt(key) is None:
+                        raise
+                    shutil.rmtree(staging, ignore_errors=True)
+                self._evict(keep=key)
+        return sorted(f for f in entry_dir.iterdir() if f.is_file())
+
+    def _pinned(self, key):
+        # Caller holds the lock
+        count, pinned_at = self._pins.get(key, (0, 0))
+        return count > 0 and time.monotonic() - pinned_at < RESULT_CACHE_PIN_MAX_AGE
+
+    def _evict(self, keep=None):
+        # Least recently used first, skipping entries a response is still reading; caller holds the lock
+        for key in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key == keep or self._pinned(key):
+                continue
+            self._remove(key)
+            self.evictions += 1
+            logging.debug("Evicted cache entry %s", key)
+
+    def _adopt(self, key):
+        # Index an entry written by another process sharing the directory; caller holds the lock
+        entry_dir = self.root / key
+        try:
+            created = entry_dir.stat().st_mtime
+            size = sum(f.stat().st_size for f in entry_dir.iterdir() if f.is_file())
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if self.ttl and time.time() - created > self.ttl:
+            return None
+        self._entries[key] = (size, created)
+        self._total_bytes += size
+        return self._entries[key]
+
+    def _remove(self, key):
+        self._pins.pop(key, None)
+        size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Shared cache used by the API routes
+result_cache = ResultCache()
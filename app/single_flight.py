@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import redis
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from libreoffice_pool import ConversionError, ConverterCrashed, ConverterUnavailable
+from metrics import set_outcome, single_flight_events
+from redis_conn import redis_binary_client
+from result_cache import result_cache
+from workspaces import workspaces
+
+# Single-flight configuration (overridable through the environment)
+SINGLE_FLIGHT = int(os.environ.get("SINGLE_FLIGHT", "1"))  # 0: every request runs its own conversion
+SINGLE_FLIGHT_LOCK_TTL = float(os.environ.get("SINGLE_FLIGHT_LOCK_TTL", "15"))  # Seconds a dead owner's lock outlives it
+SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_WAIT_TIMEOUT", "300"))  # Then convert without the owner
+SINGLE_FLIGHT_HANDOFF_MAX_BYTES = int(os.environ.get("SINGLE_FLIGHT_HANDOFF_MAX_BYTES", str(32 * 1024 * 1024)))
+SINGLE_FLIGHT_POLL_INTERVAL = 0.2  # Seconds between checks of another owner's progress
+SINGLE_FLIGHT_RESULT_TTL = 120  # Seconds a handed-off result stays readable, for requests arriving just after
+SINGLE_FLIGHT_FAILURE_TTL = 10  # Seconds a handed-off failure stays readable, enough for the waiting requests
+SINGLE_FLIGHT_REDIS_BACKOFF = 30  # Seconds coordination through Redis is skipped after a Redis error
+SINGLE_FLIGHT_KEY_PREFIX = "conversion_flight:"
+# Refusals that concern the owning request (its client's share, a full lane), not the document
+OWNER_SPECIFIC_STATUS_CODES = (429, 503)
+
+
+class NotCached(Exception):
+    """Set on a flight whose output was too large for the result cache: the waiting requests convert on their own."""
+
+
+def _shared_failure(e):
+    # Failures of the document itself are handed to the waiting requests; a refused owner or a crashed
+    # or fully busy converter is not, another owner takes over instead
+    if isinstance(e, HTTPException):
+        return e.status_code not in OWNER_SPECIFIC_STATUS_CODES
+    return isinstance(e, ConversionError) and not isinstance(e, (ConverterCrashed, ConverterUnavailable))
+
+
+class LockHeartbeat:
+    """Keeps extending a conversion lock while its owner works, so only a dead owner's lock expires."""
+
+    def __init__(self, flight, key, token):
+        self.flight = flight
+        self.key = key
+        self.token = token
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="single-flight-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.flight.lock_ttl / 3):
+            try:
+                if not self.flight._extend(self.key, self.token):
+                    logging.warning("Lost the conversion lock for %s, another request may convert it too", self.key)
+                    return
+            except redis.exceptions.RedisError as e:
+                logging.warning("Could not extend the conversion lock for %s: %s", self.key, e)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class SingleFlight:
+    """Runs each conversion (by result cache key) once while identical requests wait for its result.
+
+    Requests in the same process share an asyncio future. Across gunicorn workers and replicas the
+    first request takes a Redis lock, kept alive by a heartbeat; the others register as waiters and
+    poll for the result, which the owner hands off through Redis only when someone waits for it.
+    When the owner dies its lock expires and a waiting request takes over. Without Redis every
+    process coalesces on its own.
+    """
+
+    def __init__(self, client, enabled=SINGLE_FLIGHT, lock_ttl=SINGLE_FLIGHT_LOCK_TTL,
+                 wait_timeout=SINGLE_FLIGHT_WAIT_TIMEOUT, handoff_max_bytes=SINGLE_FLIGHT_HANDOFF_MAX_BYTES):
+        self.client = client
+        self.enabled = enabled
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.handoff_max_bytes = handoff_max_bytes
+        self._flights = {}  # Cache key -> future of the conversion this process runs for it
+        self._skip_until = 0.0
+
+    @property
+    def in_flight(self):
+        return len(self._flights)
+
+    @property
+    def distributed(self):
+        return time.monotonic() >= self._skip_until
+
+    def _redis_failed(self, action, e):
+        logging.warning("Could not %s, coalescing within this process only for %ss: %s",
+                        action, SINGLE_FLIGHT_REDIS_BACKOFF, e)
+        self._skip_until = time.monotonic() + SINGLE_FLIGHT_REDIS_BACKOFF
+
+    def _lock_key(self, key):
+        return f"{SINGLE_FLIGHT_KEY_PREFIX}{key}:lock"
+
+    def _result_key(self, key):
+        return f"{SINGLE_FLIGHT_KEY_PREFIX}{key}:result"
+
+    def _waiters_key(self, key):
+        return f"{SINGLE_FLIGHT_KEY_PREFIX}{key}:waiters"
+
+    async def run(self, key, produce):
+        """Return the output files of ``produce()``, an async conversion storing them in the result cache
+        under ``key``, or those of the identical conversion already running."""
+        if not self.enabled or not result_cache.enabled:
+            return await produce()  # Only cached files outlive the request that produced them
+        while key in self._flights:
+            future = self._flights[key]
+            single_flight_events.inc(event="coalesced_process")
+            set_outcome("coalesced")
+            try:
+                return await asyncio.shield(future)
+            except NotCached:
+                return await produce()
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # This request was cancelled, not the conversion
+                # The request running the conversion went away or was refused: run it here instead
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())  # Nobody may be waiting for a failure
+        self._flights[key] = future
+        try:
+            files = await self._run_shared(key, produce)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            if _shared_failure(e):
+                future.set_exception(e)
+            else:
+                future.cancel()  # The waiting requests take over
+            raise
+        finally:
+            del self._flights[key]
+        if all(Path(path).parent == result_cache.root / key for path in files):
+            future.set_result(files)
+        else:
+            future.set_exception(NotCached())  # The files go away with this request's workspace
+        return files
+
+    async def _run_shared(self, key, produce):
+        # One owner across processes: claim the Redis lock or wait for the result of whoever holds it
+        if not self.distributed:
+            return await produce()
+        token = uuid.uuid4().hex
+        started = time.monotonic()
+        waited = False
+        while True:
+            try:
+                owner, result = await run_in_threadpool(self._claim, key, token, waited)
+            except redis.exceptions.RedisError as e:
+                self._redis_failed("coordinate a conversion through Redis", e)
+                return await produce()
+            if result is not None:
+                files = await run_in_threadpool(self._adopt, key, result)
+                if files is not None:
+                    single_flight_events.inc(event="coalesced_redis")
+                    set_outcome("coalesced")
+                    return files
+                return await produce()  # The owner's result was too large to hand off
+            if owner:
+                if waited:
+                    # The owner may have stored the result in a cache directory this process shares
+                    files = await run_in_threadpool(result_cache.get, key)
+                    if files:
+                        await run_in_threadpool(self._release, key, token)
+                        set_outcome("coalesced")
+                        return files
+                    single_flight_events.inc(event="takeover")
+                    logging.warning("Took over conversion %s from an owner that stopped", key)
+                return await self._own(key, token, produce)
+            if time.monotonic() - started > self.wait_timeout:
+                single_flight_events.inc(event="wait_timeout")
+                logging.warning("Gave up waiting for conversion %s after %ss, converting here", key, self.wait_timeout)
+                return await produce()
+            waited = True
+            await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+
+    def _claim(self, key, token, waited):
+        # (True, None) once this request owns the conversion, (False, result) once one was handed off,
+        # (False, None) while another owner is converting. A failure is only taken over by requests that
+        # waited for it; a request arriving afterwards retries the conversion.
+        result = self.client.hgetall(self._result_key(key))
+        if result and (waited or result.get(b"status") != b"failed"):
+            return False, result
+        if not self.client.set(self._lock_key(key), token, nx=True, px=int(self.lock_ttl * 1000)):
+            if not waited:
+                # Tell the owner someone needs the result handed off
+                pipe = self.client.pipeline()
+                pipe.incr(self._waiters_key(key))
+                pipe.pexpire(self._waiters_key(key), int((self.wait_timeout + self.lock_ttl) * 1000))
+                pipe.execute()
+            return False, None
+        result = self.client.hgetall(self._result_key(key))  # Handed off between the two reads
+        if result and result.get(b"status") != b"failed":
+            self._release(key, token)
+            return False, result
+        if result:
+            self.client.delete(self._result_key(key))  # A previous owner's failure, retried now
+        return True, None
+
+    async def _own(self, key, token, produce):
+        heartbeat = LockHeartbeat(self, key, token)
+        heartbeat.start()
+        try:
+            files = await produce()
+        except BaseException as e:
+            heartbeat.stop()
+            await run_in_threadpool(self._hand_off_failure, key, token, e)
+            raise
+        heartbeat.stop()
+        await run_in_threadpool(self._hand_off, key, token, files)
+        return files
+
+    def _if_owner(self, key, token, action):
+        # Run ``action(pipe)`` atomically, only while ``token`` still holds the lock
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self._lock_key(key))
+                if pipe.get(self._lock_key(key)) != token.encode():
+                    return False
+                pipe.multi()
+                action(pipe)
+                pipe.execute()
+                return True
+            except redis.exceptions.WatchError:
+                return False
+
+    def _extend(self, key, token):
+        return self._if_owner(key, token, lambda pipe: pipe.pexpire(self._lock_key(key), int(self.lock_ttl * 1000)))
+
+    def _release(self, key, token):
+        return self._if_owner(key, token, lambda pipe: pipe.delete(self._lock_key(key)))
+
+    def _release_unless_waited_for(self, key, token):
+        # Release the lock if no request registered as a waiter; True when the result must be handed off
+        lock_key, waiters_key = self._lock_key(key), self._waiters_key(key)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(lock_key, waiters_key)
+                    if pipe.get(lock_key) != token.encode() or int(pipe.get(waiters_key) or 0):
+                        return True
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+                    return False
+                except redis.exceptions.WatchError:
+                    continue  # A waiter registered meanwhile
+
+    def _publish(self, key, token, fields, ttl):
+        # Result first, then the lock, so a request never finds neither
+        try:
+            pipe = self.client.pipeline()
+            pipe.delete(self._result_key(key))
+            pipe.hset(self._result_key(key), mapping=fields)
+            pipe.expire(self._result_key(key), ttl)
+            pipe.delete(self._waiters_key(key))
+            pipe.execute()
+            self._release(key, token)
+        except redis.exceptions.RedisError as e:
+            self._redis_failed("hand off a conversion result", e)
+
+    def _waited_for(self, key, token):
+        try:
+            return self._release_unless_waited_for(key, token)
+        except redis.exceptions.RedisError as e:
+            self._redis_failed("release a conversion lock", e)
+            return False
+
+    def _hand_off(self, key, token, files):
+        if not self._waited_for(key, token):
+            return  # Nobody else needs it: no copy through Redis
+        try:
+            size = sum(Path(path).stat().st_size for path in files)
+            if size > self.handoff_max_bytes:
+                single_flight_events.inc(event="unshared")
+                fields = {"status": "unshared"}
+            else:
+                fields = {"status": "done", **{f"file:{Path(path).name}": Path(path).read_bytes() for path in files}}
+        except OSError as e:
+            logging.warning("Could not read conversion %s for the waiting requests: %s", key, e)
+            fields = {"status": "unshared"}
+        self._publish(key, token, fields, SINGLE_FLIGHT_RESULT_TTL)
+
+    def _hand_off_failure(self, key, token, e):
+        if not _shared_failure(e):
+            try:
+                self._release(key, token)  # Another request converts it instead
+            except redis.exceptions.RedisError as error:
+                self._redis_failed("release a conversion lock", error)
+            return
+        if not self._waited_for(key, token):
+            return
+        if isinstance(e, HTTPException):
+            fields = {"status": "failed", "status_code": str(e.status_code), "detail": str(e.detail)}
+        else:
+            fields = {"status": "failed", "error": str(e)}
+        self._publish(key, token, fields, SINGLE_FLIGHT_FAILURE_TTL)
+
+    def _adopt(self, key, result):
+        # Output files of a handed-off result, stored in this process's result cache; None if not shared
+        status = result.get(b"status")
+        if status == b"failed":
+            if b"status_code" in result:
+                raise HTTPException(status_code=int(result[b"status_code"]), detail=result[b"detail"].decode())
+            raise ConversionError(result[b"error"].decode())
+        if status != b"done":
+            return None
+        folder = workspaces.create("flight")
+        try:
+            paths = []
+            for field, data in result.items():
+                if field.startswith(b"file:"):
+                    path = folder / Path(field[len(b"file:"):].decode()).name
+                    path.write_bytes(data)
+                    paths.append(path)
+            files = result_cache.put(key, paths)
+            if any(folder in Path(path).parents for path in files):
+                return None  # Too large for this cache, the files go with the folder
+            return files
+        finally:
+            workspaces.release(folder)
+
+
+# Shared single-flight coordinator used by the API routes
+single_flight = SingleFlight(redis_binary_client)
@@ -0,0 +1,180 @@
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from libreoffice_pool import ConversionTimeout, ConverterCrashed, ConverterUnavailable
+from metrics import converter_crashes, converter_timeouts
+
+# Pool configuration (overridable through the environment)
+SPIRE_POOL_SIZE = int(os.environ.get("SPIRE_POOL_SIZE", "2"))
+SPIRE_MAX_DOCUMENTS = int(os.environ.get("SPIRE_MAX_DOCUMENTS", "50"))  # Replace a worker process after this many documents
+SPIRE_FILTER_CHUNK_SIZE = 64 * 1024
+SPIRE_TIMEOUT = float(os.environ.get("SPIRE_TIMEOUT", "120"))  # Seconds before a conversion is killed
+SPIRE_ATTEMPTS = 2  # Runs of a job whose pool another job's crash or timeout took down
+
+# Spire HtmlExportOptions applied below; part of the cache key so changing them invalidates old results
+SPIRE_HTML_EXPORT_OPTIONS = "spire:IsExportDocumentStyles=True;CssStyleSheetType=Internal;ImageEmbedded=True;IsTextInputFormFieldAsText=True"
+
+# Regex pattern to remove both types of evaluation warning spans
+EVALUATION_WARNING_PATTERN = re.compile(
+    r'<span\s+style="[^"]*(font-family:\'Times New Roman\';\s*)?color:#ff0000[^"]*">Evaluation Warning: The document was created with Spire\.Doc for Python\.</span>'
+)
+# A warning span is far shorter than this; an unclosed <span> longer than it is passed through
+MAX_HELD_BACK = 64 * 1024
+
+
+def strip_evaluation_warning(chunks):
+    """Remove the evaluation warning spans from a stream of HTML text chunks, yielding the cleaned text.
+
+    Text from an unclosed ``<span`` at the end of a chunk is held back until the next one,
+    so a warning split across chunks is still matched.
+    """
+    pending = ""
+    for chunk in chunks:
+        text = EVALUATION_WARNING_PATTERN.sub("", pending + chunk)
+        cut = text.rfind("<span")
+        if cut == -1 or text.find("</span>", cut) != -1 or len(text) - cut > MAX_HELD_BACK:
+            cut = max(len(text) - len("<span"), 0)  # Still keep a partial "<spa" for the next chunk
+        pending = text[cut:]
+        if cut:
+            yield text[:cut]
+    if pending:
+        yield EVALUATION_WARNING_PATTERN.sub("", pending)
+
+
+def _read_chunks(f, size=SPIRE_FILTER_CHUNK_SIZE):
+    while True:
+        chunk = f.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _warm_up():
+    # Pay for loading Spire's native library once per worker process, not on its first document
+    from spire.doc import Document
+
+    Document().Dispose()
+
+
+def convert_docx_to_html(file_path):
+    # Runs in a pool process: convert DOCX to HTML using Spire.Doc, then strip the warning on the way to disk
+    from spire.doc import CssStyleSheetType, Document, FileFormat
+
+    file_path = Path(file_path)
+    html_file_path = file_path.with_suffix(".html")
+    raw_html_path = file_path.with_suffix(".spire.html")
+
+    document = Document()
+    try:
+        # Load the DOCX file
+        document.LoadFromFile(str(file_path))
+
+        # Export document style to head in HTML
+        document.HtmlExportOptions.IsExportDocumentStyles = True
+
+        # Set the type of CSS style sheet as internal
+        document.HtmlExportOptions.CssStyleSheetType = CssStyleSheetType.Internal
+
+        # Embed images in HTML code
+        document.HtmlExportOptions.ImageEmbedded = True
+
+        # Export form fields as text
+        document.HtmlExportOptions.IsTextInputFormFieldAsText = True
+
+        # Save the document as an HTML file
+        document.SaveToFile(str(raw_html_path), FileFormat.Html)
+    finally:
+        # Dispose of the document object to release resources
+        document.Dispose()
+
+    # Filter chunk by chunk instead of reading the whole HTML back into memory
+    try:
+        with open(raw_html_path, "r", encoding="utf-8") as src, open(html_file_path, "w", encoding="utf-8") as dst:
+            for text in strip_evaluation_warning(_read_chunks(src)):
+                dst.write(text)
+    finally:
+        raw_html_path.unlink(missing_ok=True)
+    return html_file_path
+
+
+class SpirePool:
+    """Pool of pre-initialised Spire.Doc worker processes, each replaced after a number of documents to contain native leaks."""
+
+    def __init__(self, size=SPIRE_POOL_SIZE, max_documents=SPIRE_MAX_DOCUMENTS):
+        self.size = size
+        self.max_documents = max_documents
+        self._executor = None
+        self._lock = threading.Lock()
+        # One job per worker process at a time, so a job's deadline never includes waiting behind others
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+            max_tasks_per_child=self.max_documents,
+        )
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create_executor()
+                self._executor.submit(os.getpid)  # Spawns (and so warms up) the worker processes now
+                logging.info("Spire pool started with %s worker processes", self.size)
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                logging.info("Spire pool stopped")
+
+    def _discard(self, executor, kill=False):
+        # Start over with fresh processes (once, however many jobs saw the failure); False if already done
+        with self._lock:
+            if self._executor is not executor:
+                return False
+            if kill:
+                # A single task cannot be cancelled once running: kill the pool's processes, the hung one among them
+                for process in list(executor._processes.values()):
+                    process.kill()
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            return True
+
+    def convert_docx_to_html(self, file_path, timeout=SPIRE_TIMEOUT):
+        with self._slots:
+            return self._convert(file_path, timeout)
+
+    def _convert(self, file_path, timeout):
+        for _ in range(SPIRE_ATTEMPTS):
+            executor = self.start()
+            try:
+                return executor.submit(convert_docx_to_html, str(file_path)).result(timeout=timeout or None)
+            except FutureTimeoutError:
+                logging.error("Spire conversion of %s exceeded its %ss deadline, killing the pool", file_path, timeout)
+                converter_timeouts.inc(converter="spire", reason="deadline")
+                self._discard(executor, kill=True)
+                raise ConversionTimeout(f"Spire.Doc did not finish within {timeout:g}s")
+            except BrokenProcessPool as e:
+                if self._discard(executor):
+                    # First to see the pool break: a worker died inside native code
+                    logging.error("Spire worker process crashed: %s", e)
+                    converter_crashes.inc(converter="spire")
+                    raise ConverterCrashed(f"Spire.Doc worker crashed: {e}")
+                # Another job's timeout or crash took the pool down with this one: run it again
+                logging.warning("Spire pool replaced while converting %s, retrying", file_path)
+        raise ConverterUnavailable("Spire.Doc pool kept being replaced, please retry")
+
+
+# Shared pool used by the API routes
+spire_pool = SpirePool()
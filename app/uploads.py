@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+from collections import namedtuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from metrics import timed_stage
+
+# Ingestion configuration (overridable through the environment)
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Leading bytes of each supported document type
+MAGIC_SIGNATURES = {
+    "docx": b"PK\x03\x04",  # OOXML documents are ZIP archives
+    "pdf": b"%PDF-",
+    "doc": b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",  # OLE2 compound file
+}
+
+
+IngestedUpload = namedtuple("IngestedUpload", ["path", "size", "sha256", "kind"])
+
+
+def sniff_kind(head):
+    for kind, signature in MAGIC_SIGNATURES.items():
+        if head.startswith(signature):
+            return kind
+    return None
+
+
+def _too_large():
+    return HTTPException(
+        status_code=413, detail=f"File too large. The maximum upload size is {UPLOAD_MAX_BYTES} bytes."
+    )
+
+
+def _copy_upload(source, dest_path, allowed_kinds, max_bytes):
+    # Runs in a worker thread: one fixed-size chunk in memory at a time, hashed as it is written
+    hasher = hashlib.sha256()
+    size = 0
+    source.seek(0)
+    first_chunk = source.read(UPLOAD_CHUNK_SIZE)
+    kind = sniff_kind(first_chunk)
+    if kind not in allowed_kinds:
+        logging.error("Uploaded content does not look like any of %s", allowed_kinds)
+        raise HTTPException(status_code=400, detail="Invalid file content. The file does not match its declared type.")
+
+    try:
+        with open(dest_path, "wb") as f:
+            chunk = first_chunk
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large()
+                hasher.update(chunk)
+                f.write(chunk)
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+    except HTTPException:
+        os.remove(dest_path)
+        raise
+    return IngestedUpload(dest_path, size, hasher.hexdigest(), kind)
+
+
+async def save_upload(file, dest_path, allowed_kinds, max_bytes=UPLOAD_MAX_BYTES):
+    """Stream ``file`` to ``dest_path`` in chunks, checking its magic bytes and size and hashing it on the way."""
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large()
+    with timed_stage("upload"):
+        upload = await run_in_threadpool(_copy_upload, file.file, dest_path, allowed_kinds, max_bytes)
+    logging.debug("Ingested %s bytes (%s, sha256 %s) to %s", upload.size, upload.kind, upload.sha256, dest_path)
+    return upload
+
+
+class UploadTooLarge(Exception):
+    """Raised from the request body stream once it passes the upload limit."""
+
+
+class UploadSizeLimitMiddleware:
+    """Rejects requests whose body is over the upload limit: up front from ``Content-Length`` when the
+    client declares it, otherwise as soon as the streamed (e.g. chunked) body passes the limit.
+
+    ``path_limits`` maps a route path to its own limit, for routes taking several files in one body
+    (each file is still held to ``UPLOAD_MAX_BYTES`` by ``save_upload``).
+    """
+
+    def __init__(self, app, max_bytes=UPLOAD_MAX_BYTES, path_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    def _limit_for(self, path):
+        return self.path_limits.get(path, self.max_bytes)
+
+    async def _reject(self, scope, receive, send, max_bytes):
+        if max_bytes == self.max_bytes:
+            detail = f"File too large. The maximum upload size is {max_bytes} bytes."
+        else:
+            detail = f"Request too large. The maximum upload size for this route is {max_bytes} bytes."
+        response = JSONResponse(status_code=413, content={"detail": detail})
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        max_bytes = self._limit_for(scope["path"])
+        # Leave room for the multipart boundaries and headers around the files themselves
+        max_body_bytes = max_bytes + 64 * 1024
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > max_body_bytes:
+                    await self._reject(scope, receive, send, max_bytes)
+                    return
+                break
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    too_large = True
+                    raise UploadTooLarge()  # Stops the form parser before it spools any more
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if too_large:
+                return  # Whatever the app answers to the aborted body is replaced by the 413
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not too_large:
+                raise
+        if too_large and not response_started:
+            logging.warning("Rejected a request body over %s bytes", max_body_bytes)
+            await self._reject(scope, receive, send, max_bytes)
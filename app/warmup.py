@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+import time
+
+from libreoffice_pool import lo_pool
+from pdf2docx_converter import pdf_text_engine
+from pipeline import PDF2HTML_PIPELINE
+from redis_conn import redis_client
+from spire_pool import spire_pool
+from workspaces import workspaces
+
+# Warm-up configuration (overridable through the environment)
+CONVERSION_WARMUP = int(os.environ.get("CONVERSION_WARMUP", "0"))  # 1: pre-start the converters before reporting ready
+CONVERSION_WARMUP_REQUIRED = int(os.environ.get("CONVERSION_WARMUP_REQUIRED", "1"))  # 1: not ready while a warm-up step failed
+
+
+def write_sample_docx(path):
+    # One-paragraph document, just enough to take every converter through a full load and export
+    from docx import Document
+
+    document = Document()
+    document.add_paragraph("Warm-up")
+    document.save(path)
+    return path
+
+
+class WarmUp:
+    """Starts the converters and runs one tiny conversion of each type in a background thread.
+
+    Without it every converter starts on first use. ``ready`` turns true once the warm-up has
+    finished (straight away when it is disabled); failed steps, and the steps that needed their
+    output, are logged and reported, not retried.
+    """
+
+    def __init__(self, enabled=CONVERSION_WARMUP):
+        self.enabled = enabled
+        self.timings = {}
+        self.failed = []
+        self.skipped = []
+        self._done = threading.Event()
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    @property
+    def healthy(self):
+        return not self.failed and not self.skipped
+
+    def _skip(self, *names):
+        logging.error("Warm-up steps %s skipped, a step they depend on failed", ", ".join(names))
+        self.skipped.extend(names)
+
+    def _step(self, name, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            logging.error("Warm-up step %s failed: %s", name, e)
+            self.failed.append(name)
+            return None
+        finally:
+            self.timings[name] = round(time.perf_counter() - started, 3)
+
+    def _outdir(self, folder, name):
+        path = folder / name
+        path.mkdir()
+        return path
+
+    def _run(self):
+        started = time.perf_counter()
+        self._step("redis", redis_client.ping)
+        self._step("libreoffice_start", lo_pool.start)
+        self._step("spire_start", spire_pool.start)
+        self._step("pdf_text_start", pdf_text_engine.start)
+
+        folder = workspaces.create("warmup")
+        try:
+            pdf_path = None
+            docx_path = self._step("sample", write_sample_docx, folder / "warmup.docx")
+            if docx_path:
+                pdf_path = self._step("docx2pdf", lo_pool.convert, docx_path, self._outdir(folder, "pdf"), "pdf")
+                self._step("docx2html", lo_pool.convert, docx_path, self._outdir(folder, "html"), "html:HTML:EmbedImages")
+                self._step("spire_docx2html", spire_pool.convert_docx_to_html, docx_path)
+            else:
+                self._skip("docx2pdf", "docx2html", "spire_docx2html")
+            if pdf_path:
+                self._step("pdf2docx", lo_pool.convert, pdf_path, self._outdir(folder, "docx"), "docx")
+                self._step("pdf2html", PDF2HTML_PIPELINE.run, ["html"], source=pdf_path, outdir=self._outdir(folder, "pipeline"))
+                self._step("pdf2docx_text", pdf_text_engine.convert, pdf_path, folder / "text.docx")
+            else:
+                self._skip("pdf2docx", "pdf2html", "pdf2docx_text")
+        finally:
+            workspaces.release(folder)
+            self._done.set()
+        logging.info(
+            "Warm-up finished in %.2fs (%s)%s%s",
+            time.perf_counter() - started,
+            ", ".join(f"{name}={seconds}s" for name, seconds in self.timings.items()),
+            f", failed: {', '.join(self.failed)}" if self.failed else "",
+            f", skipped: {', '.join(self.skipped)}" if self.skipped else "",
+        )
+
+    def start(self):
+        if not self.enabled:
+            self._done.set()
+            return
+        threading.Thread(target=self._run, name="warmup", daemon=True).start()
+
+
+# Shared warm-up run from the API lifespan
+warmup = WarmUp()
@@ -0,0 +1,155 @@
+import logging
+import os
+import re
+import shutil
+import signal
+import threading
+
+# Deadlines in seconds (overridable through the environment)
+LIBREOFFICE_TIMEOUT = float(os.environ.get("LIBREOFFICE_TIMEOUT", "120"))
+# Per target format overrides, e.g. "pdf=60,html=180"
+LIBREOFFICE_TIMEOUTS = {
+    target.strip(): float(seconds)
+    for target, _, seconds in (
+        item.partition("=") for item in os.environ.get("LIBREOFFICE_TIMEOUTS", "").split(",") if item.strip()
+    )
+}
+LIBREOFFICE_REAP_INTERVAL = float(os.environ.get("LIBREOFFICE_REAP_INTERVAL", "60"))
+
+WORKER_PIPE_PATTERN = re.compile(r"--accept=pipe,name=lo_pool_(\d+)_\d+")
+PROFILE_DIR_PATTERN = re.compile(r"^lo_pool_(\d+)_\d+$")
+
+
+def conversion_timeout(convert_to):
+    # Deadline for producing one output with the given --convert-to spec ("pdf", "html:HTML:EmbedImages", ...)
+    return LIBREOFFICE_TIMEOUTS.get(convert_to.split(":", 1)[0], LIBREOFFICE_TIMEOUT)
+
+
+def kill_process_group(process):
+    """SIGKILL everything in the process group led by ``process`` (started with ``start_new_session=True``)."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    try:
+        process.wait(timeout=5)
+    except Exception:
+        pass
+
+
+class Deadline:
+    """Calls ``on_expire`` from a timer thread if the ``with`` block is still running after ``seconds``."""
+
+    def __init__(self, seconds, on_expire):
+        self.seconds = seconds
+        self.on_expire = on_expire
+        self.expired = False
+        self._timer = None
+
+    def _expire(self):
+        self.expired = True
+        self.on_expire()
+
+    def __enter__(self):
+        if self.seconds:
+            self._timer = threading.Timer(self.seconds, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._timer is not None:
+            self._timer.cancel()
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _soffice_processes():
+    # (pid, parent pid, age in seconds, command line) of every soffice/oosplash process visible to us
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    with open("/proc/uptime") as f:
+        uptime = float(f.read().split()[0])
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/cmdline", "rb") as f:
+                cmdline = f.read().decode("utf-8", "replace").split("\0")
+            with open(f"/proc/{entry.name}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        executable = os.path.basename(cmdline[0]) if cmdline else ""
+        if not executable.startswith(("soffice", "oosplash")):
+            continue
+        age = uptime - int(fields[19]) / clock_ticks  # Field 22 of stat: start time in clock ticks after boot
+        yield int(entry.name), int(fields[1]), age, " ".join(cmdline)
+
+
+def reap_orphans(profile_root=None, max_age=None):
+    """Kill soffice processes left behind by dead API processes or abandoned one-off runs.
+
+    A pool instance is orphaned once the process named in its pipe (``lo_pool_<pid>_<n>``) is gone;
+    a one-off ``--convert-to`` run is orphaned once re-parented to init and older than ``max_age``.
+    """
+    max_age = max_age if max_age is not None else max([LIBREOFFICE_TIMEOUT, *LIBREOFFICE_TIMEOUTS.values()])
+    killed = 0
+    for pid, parent_pid, age, cmdline in _soffice_processes():
+        owner = WORKER_PIPE_PATTERN.search(cmdline)
+        if owner:
+            orphaned = not _is_alive(int(owner.group(1)))
+        else:
+            orphaned = parent_pid == 1 and "--convert-to" in cmdline and age > max_age
+        if orphaned:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                killed += 1
+                logging.warning("Killed orphaned LibreOffice process %s (%.0fs old)", pid, age)
+            except ProcessLookupError:
+                pass
+
+    # Profiles of pool instances whose API process is gone
+    if profile_root is not None and os.path.isdir(profile_root):
+        for entry in os.scandir(profile_root):
+            owner = PROFILE_DIR_PATTERN.match(entry.name)
+            if owner and not _is_alive(int(owner.group(1))):
+                shutil.rmtree(entry.path, ignore_errors=True)
+    return killed
+
+
+class OrphanReaper:
+    """Background thread running ``reap_orphans`` periodically."""
+
+    def __init__(self, profile_root=None, interval=LIBREOFFICE_REAP_INTERVAL):
+        self.profile_root = profile_root
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _loop(self):
+        while True:
+            try:
+                reap_orphans(self.profile_root)
+            except Exception as e:
+                logging.error("Reaping orphaned LibreOffice processes failed: %s", e)
+            if self._stopped.wait(self.interval):
+                return
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, name="soffice-reaper", daemon=True)
+        self._thread.start()
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
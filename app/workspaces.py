@@ -0,0 +1,169 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from starlette.background import BackgroundTask
+
+# Workspace configuration (overridable through the environment)
+WORKSPACE_DIR = Path(os.environ.get("WORKSPACE_DIR", "uploads"))
+WORKSPACE_TMPFS_DIR = os.environ.get("WORKSPACE_TMPFS_DIR", "/dev/shm/docx-conversion")  # Empty disables tmpfs workspaces
+WORKSPACE_TMPFS_MIN_FREE = int(os.environ.get("WORKSPACE_TMPFS_MIN_FREE", str(1024 * 1024 * 1024)))  # Fall back to disk below this
+WORKSPACE_MAX_AGE = float(os.environ.get("WORKSPACE_MAX_AGE", "3600"))  # Seconds before a leftover workspace is swept
+WORKSPACE_MAX_BYTES = int(os.environ.get("WORKSPACE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))  # Per root, oldest swept first
+WORKSPACE_SWEEP_INTERVAL = float(os.environ.get("WORKSPACE_SWEEP_INTERVAL", "60"))
+WORKSPACE_SWEEP_GRACE = 300  # Seconds; younger entries may belong to a request in another process
+
+
+def _tree_size(path):
+    if not path.is_dir():
+        return path.stat().st_size
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.stat(os.path.join(dirpath, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def _remove(path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+class Workspace:
+    """Scratch directory owned by one request; ``close()`` removes it unless it was handed to the response."""
+
+    def __init__(self, manager, path):
+        self.manager = manager
+        self.path = path
+        self._handed_off = False
+
+    def close(self):
+        if not self._handed_off:
+            self.manager.release(self.path)
+
+    def cleanup_after(self, response):
+        # Keep the files until the response body has been sent, then remove them
+        response.background = BackgroundTask(self.manager.release, self.path)
+        self._handed_off = True
+        return response
+
+
+class WorkspaceManager:
+    """Hands out a unique scratch directory per request and sweeps whatever is left behind.
+
+    Workspaces live on tmpfs when it is available with enough free space and on disk otherwise.
+    A background thread removes entries older than ``max_age`` and, oldest first, whatever
+    keeps a root above ``max_bytes``.
+    """
+
+    def __init__(self, disk_root=WORKSPACE_DIR, tmpfs_root=WORKSPACE_TMPFS_DIR, tmpfs_min_free=WORKSPACE_TMPFS_MIN_FREE,
+                 max_age=WORKSPACE_MAX_AGE, max_bytes=WORKSPACE_MAX_BYTES, sweep_interval=WORKSPACE_SWEEP_INTERVAL):
+        self.disk_root = Path(disk_root).resolve()
+        self.tmpfs_root = Path(tmpfs_root) if tmpfs_root else None
+        self.tmpfs_min_free = tmpfs_min_free
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._active = set()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def roots(self):
+        return [root for root in (self.tmpfs_root, self.disk_root) if root is not None]
+
+    def _pick_root(self):
+        # tmpfs spares the disk for short-lived files, but only while it has room for an upload and its outputs
+        if self.tmpfs_root is not None:
+            try:
+                self.tmpfs_root.mkdir(parents=True, exist_ok=True)
+                if shutil.disk_usage(self.tmpfs_root).free >= self.tmpfs_min_free:
+                    return self.tmpfs_root
+            except OSError:
+                pass
+        return self.disk_root
+
+    def create(self, prefix="req"):
+        """Create and return a new, unique workspace directory."""
+        path = self._pick_root() / f"{prefix}-{uuid.uuid4().hex}"
+        path.mkdir(parents=True)
+        with self._lock:
+            self._active.add(path)
+        return path
+
+    def workspace(self, prefix="req"):
+        return Workspace(self, self.create(prefix))
+
+    def release(self, path):
+        with self._lock:
+            self._active.discard(path)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def sweep(self):
+        """Remove expired leftovers, then the oldest entries of any root over its size quota."""
+        now = time.time()
+        removed = 0
+        for root in self.roots:
+            if not root.is_dir():
+                continue
+            with self._lock:
+                active = set(self._active)
+            entries = []
+            for path in root.iterdir():
+                if path in active:
+                    continue
+                try:
+                    mtime = path.stat().st_mtime
+                    size = _tree_size(path)
+                except FileNotFoundError:
+                    continue
+                if self.max_age and now - mtime > self.max_age:
+                    _remove(path)
+                    removed += 1
+                else:
+                    entries.append((mtime, size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes or now - mtime < WORKSPACE_SWEEP_GRACE:
+                    break
+                _remove(path)
+                total -= size
+                removed += 1
+        if removed:
+            logging.info("Workspace sweep removed %s leftover entries", removed)
+        return removed
+
+    def _sweep_loop(self):
+        while not self._stopped.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error("Workspace sweep failed: %s", e)
+
+    def start(self):
+        self.disk_root.mkdir(parents=True, exist_ok=True)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._sweep_loop, name="workspace-sweeper", daemon=True)
+        self._thread.start()
+        logging.info("Workspaces under %s", ", ".join(str(root) for root in self.roots))
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+# Shared workspace manager used by the API routes
+workspaces = WorkspaceManager()
@@ -0,0 +1,64 @@
+import zipfile
+from collections import deque
+from pathlib import Path
+
+ZIP_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Formats that are already compressed; deflating them again costs CPU for no gain
+STORED_SUFFIXES = {".png", ".gif", ".jpg", ".jpeg", ".webp"}
+
+
+class ZipStreamWriter:
+    """Write-only file object for zipfile that hands off the archive bytes in chunks as they are produced.
+
+    It has no seek/tell, so zipfile writes each member with a trailing data descriptor and
+    never needs to go back: the archive can be sent while later members are still being added.
+    """
+
+    def __init__(self, emit, chunk_size=ZIP_STREAM_CHUNK_SIZE):
+        self.emit = emit
+        self.chunk_size = chunk_size
+        self._buffer = []
+        self._buffered = 0
+
+    def write(self, data):
+        if data:
+            self._buffer.append(bytes(data))
+            self._buffered += len(data)
+            if self._buffered >= self.chunk_size:
+                self.flush()
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self.emit(b"".join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+
+def open_zip_stream(emit, chunk_size=ZIP_STREAM_CHUNK_SIZE):
+    return zipfile.ZipFile(ZipStreamWriter(emit, chunk_size), "w", zipfile.ZIP_DEFLATED)
+
+
+def member_compression(path):
+    return zipfile.ZIP_STORED if Path(path).suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+
+
+def iter_zip(members, chunk_size=ZIP_STREAM_CHUNK_SIZE):
+    """Yield a ZIP archive of ``(path, arcname)`` members chunk by chunk, without building it on disk."""
+    chunks = deque()
+    with open_zip_stream(chunks.append, chunk_size) as zipf:
+        for path, arcname in members:
+            zinfo = zipfile.ZipInfo.from_file(path, arcname)
+            zinfo.compress_type = member_compression(path)
+            with open(path, "rb") as src, zipf.open(zinfo, "w", force_zip64=zinfo.file_size > zipfile.ZIP64_LIMIT) as dest:
+                while True:
+                    block = src.read(chunk_size)
+                    if not block:
+                        break
+                    dest.write(block)
+                    while chunks:
+                        yield chunks.popleft()
+    # Closing the archive wrote the central directory
+    while chunks:
+        yield chunks.popleft()
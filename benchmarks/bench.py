@@ -0,0 +1,424 @@
+"""Load/benchmark harness for the conversion API.
+
+Drives the conversion endpoints with a synthetic corpus at one or more concurrency levels and
+reports throughput, latency percentiles and the server's peak RSS, saved as JSON for comparing runs.
+A spawned server also gets its import time, its time until ready and until the first finished conversion,
+and the latency of one cold request per endpoint measured.
+
+    python benchmarks/bench.py --spawn --stub --concurrency 1,8 --requests 50
+    python benchmarks/bench.py --url http://localhost:7002 --server-pid 1234 --sizes small,medium
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from corpus import SIZES, build_corpus, make_unique
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCH_DIR.parent / "app"
+STUB_DIR = BENCH_DIR / "stub"
+
+CONTENT_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pdf": "application/pdf",
+}
+# name -> (path, source kind, extra form fields)
+ENDPOINTS = {
+    "v1-docx2html": ("/api/v1/convert/docx2html/", "docx", {}),
+    "v1-docx2pdf": ("/api/v1/convert/docx2pdf/", "docx", {}),
+    "v1-pdf2docx": ("/api/v1/convert/pdf2docx/", "pdf", {}),
+    "v1-pdf2docx-text": ("/api/v1/convert/pdf2docx/?mode=text", "pdf", {}),
+    "v1-pdf2html": ("/api/v1/convert/pdf2html/", "pdf", {}),
+    "v1-batch": ("/api/v1/convert/batch/", "docx", {"target_format": "pdf"}),
+    "v2-docx2html": ("/api/v2/convert/docx2html/", "docx", {}),
+    "jobs": ("/api/v1/jobs/", "docx", {"target_format": "pdf"}),
+}
+DEFAULT_ENDPOINTS = [name for name in ENDPOINTS if name != "jobs"]  # Jobs need Redis and a job worker
+JOB_POLL_INTERVAL = 0.2
+RSS_SAMPLE_INTERVAL = 0.1
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, content_type, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode()
+        )
+        parts.append(data)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def http(method, url, body=None, content_type=None, timeout=300):
+    """Return (status, response body); HTTP errors are returned, connection errors raised."""
+    request = urllib.request.Request(url, data=body, method=method)
+    if content_type:
+        request.add_header("Content-Type", content_type)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def process_tree_rss(pid):
+    """Resident set size in bytes of ``pid`` and all of its descendants (Linux /proc)."""
+    children = {}
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry.name}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry.name))
+
+    total = 0
+    pending = [pid]
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except OSError:
+            continue
+        pending.extend(children.get(current, []))
+    return total
+
+
+class RssSampler:
+    """Samples the server's process-tree RSS in the background and keeps the peak since the last reset."""
+
+    def __init__(self, pid, interval=RSS_SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.overall_peak = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            rss = process_tree_rss(self.pid)
+            self.peak = max(self.peak, rss)
+            self.overall_peak = max(self.overall_peak, rss)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def reset(self):
+        self.peak = process_tree_rss(self.pid)
+        return self.peak
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(base_url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {process.returncode}")
+        try:
+            if http("GET", f"{base_url}/health/ready", timeout=2)[0] == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("Server did not become ready in time")
+
+
+def server_env(stub, workdir, warmup):
+    # Environment of the spawned API, with scratch directories under ``workdir``
+    env = dict(os.environ)
+    env.update(
+        RESULT_CACHE_DIR=str(workdir / "cache"),
+        WORKSPACE_DIR=str(workdir / "uploads"),
+        JOBS_DIR=str(workdir / "jobs"),
+        CONVERSION_WARMUP="1" if warmup else "0",
+    )
+    if stub:
+        # Stand-in converters, so the run measures the server's own overhead
+        env["PATH"] = f"{STUB_DIR / 'bin'}{os.pathsep}{env.get('PATH', '')}"
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(STUB_DIR), env.get("PYTHONPATH")]))
+        env["LIBREOFFICE_POOL_SIZE"] = "0"
+    return env
+
+
+def measure_import(env, runs=3):
+    """Seconds taken by ``import app`` in fresh interpreters: (first run, best run)."""
+    script = "import time; started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+    times = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return times[0], min(times)
+
+
+def spawn_server(port, env, with_job_worker, log_file):
+    """Start the API (and optionally a job worker) from app/; returns (base URL, processes, start time)."""
+    started = time.perf_counter()
+    processes = [subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )]
+    if with_job_worker:
+        processes.append(subprocess.Popen(
+            [sys.executable, "job_worker.py"], cwd=APP_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+        ))
+    base_url = f"http://127.0.0.1:{port}"
+    wait_until_ready(base_url, processes[0])
+    return base_url, processes, started
+
+
+def stop_processes(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class Driver:
+    """Sends one request to an endpoint and returns (ok, latency in seconds, bytes sent, bytes received)."""
+
+    def __init__(self, base_url, corpus, allow_cache_hits=False, batch_size=5, timeout=300):
+        self.base_url = base_url
+        self.corpus = corpus
+        self.allow_cache_hits = allow_cache_hits
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+    def _document(self, kind, corpus_name):
+        data = self.corpus[corpus_name][kind]
+        return data if self.allow_cache_hits else make_unique(kind, data, uuid.uuid4().hex)
+
+    def send(self, endpoint, corpus_name):
+        path, kind, fields = ENDPOINTS[endpoint]
+        count = self.batch_size if endpoint == "v1-batch" else 1
+        field_name = "files" if endpoint == "v1-batch" else "file"
+        files = [
+            (field_name, f"{corpus_name}-{index}.{kind}", CONTENT_TYPES[kind], self._document(kind, corpus_name))
+            for index in range(count)
+        ]
+        body, content_type = encode_multipart(fields, files)
+
+        started = time.perf_counter()
+        status, content = http("POST", self.base_url + path, body, content_type, timeout=self.timeout)
+        received = len(content)
+        if endpoint == "jobs" and status == 202:
+            status, received = self._wait_for_job(json.loads(content)["job_id"], received)
+        return 200 <= status < 300, time.perf_counter() - started, len(body), received
+
+    def _wait_for_job(self, job_id, received):
+        while True:
+            status, content = http("GET", f"{self.base_url}/api/v1/jobs/{job_id}", timeout=self.timeout)
+            received += len(content)
+            state = json.loads(content).get("state") if status == 200 else "failed"
+            if state == "done":
+                status, content = http("GET", f"{self.base_url}/api/v1/jobs/{job_id}/result", timeout=self.timeout)
+                return status, received + len(content)
+            if state == "failed":
+                return 500, received
+            time.sleep(JOB_POLL_INTERVAL)
+
+
+def cold_requests(driver, endpoints, corpus_name):
+    """One request per endpoint before anything else: {endpoint: latency in ms, None on failure}, time finished."""
+    latencies = {}
+    first_ok_at = None
+    for endpoint in endpoints:
+        try:
+            ok, latency, _, _ = driver.send(endpoint, corpus_name)
+        except OSError:
+            ok = False
+        latencies[endpoint] = round(latency * 1000, 2) if ok else None
+        if ok and first_ok_at is None:
+            first_ok_at = time.perf_counter()
+    return latencies, first_ok_at
+
+
+def run_cell(driver, endpoint, corpus_name, concurrency, requests, warmup, sampler):
+    for _ in range(warmup):
+        driver.send(endpoint, corpus_name)
+    if sampler:
+        sampler.reset()
+
+    def task(_):
+        try:
+            return driver.send(endpoint, corpus_name)
+        except OSError:
+            return False, None, 0, 0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(task, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(round(latency * 1000, 2) for ok, latency, _, _ in outcomes if ok)
+    return {
+        "endpoint": endpoint,
+        "corpus": corpus_name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": requests - len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+        "bytes_sent": sum(sent for _, _, sent, _ in outcomes),
+        "bytes_received": sum(received for _, _, _, received in outcomes),
+        "peak_rss_bytes": sampler.peak if sampler else None,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (otherwise use --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="Start a server from app/ for the run")
+    parser.add_argument("--stub", action="store_true", help="With --spawn: replace LibreOffice and Spire.Doc by stubs")
+    parser.add_argument("--server-warmup", action="store_true",
+                        help="With --spawn: warm the converters up (CONVERSION_WARMUP=1) before the server reports ready")
+    parser.add_argument("--server-pid", type=int, help="PID of a running server, to sample its peak RSS")
+    parser.add_argument("--endpoints", default=",".join(DEFAULT_ENDPOINTS),
+                        help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="Comma-separated subset of: small, medium, large")
+    parser.add_argument("--images", choices=["both", "with", "without"], default="both")
+    parser.add_argument("--concurrency", default="1,4", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=20, help="Measured requests per endpoint/corpus/concurrency")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests before each measurement")
+    parser.add_argument("--batch-size", type=int, default=5, help="Files per v1-batch request")
+    parser.add_argument("--allow-cache-hits", action="store_true", help="Resend identical bytes instead of unique ones")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", default="bench_output.json", help="Where to write the JSON results")
+    parser.add_argument("--server-log", help="With --spawn: file receiving the server's output")
+    args = parser.parse_args(argv)
+    if not args.url and not args.spawn:
+        parser.error("either --url or --spawn is required")
+    if (args.stub or args.server_warmup) and not args.spawn:
+        parser.error("--stub and --server-warmup only apply to a spawned server")
+    unknown = set(args.endpoints.split(",")) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    endpoints = args.endpoints.split(",")
+    with_images = {"both": (False, True), "with": (True,), "without": (False,)}[args.images]
+    corpus = build_corpus(args.sizes.split(","), with_images)
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+    processes = []
+    spawned_at = startup_s = import_s = first_conversion_s = None
+    server_pid = args.server_pid
+    log_file = open(args.server_log, "ab") if args.server_log else subprocess.DEVNULL
+    workdir = tempfile.TemporaryDirectory(prefix="bench-")
+    try:
+        if args.spawn:
+            env = server_env(args.stub, Path(workdir.name), args.server_warmup)
+            import_s = measure_import(env)
+            base_url, processes, spawned_at = spawn_server(free_port(), env, "jobs" in endpoints, log_file)
+            startup_s = time.perf_counter() - spawned_at
+            server_pid = processes[0].pid
+        else:
+            base_url = args.url.rstrip("/")
+        sampler = RssSampler(server_pid).start() if server_pid else None
+
+        driver = Driver(base_url, corpus, args.allow_cache_hits, args.batch_size, args.timeout)
+        cold_ms, first_ok_at = cold_requests(driver, endpoints, next(iter(corpus)))
+        if spawned_at is not None and first_ok_at is not None:
+            first_conversion_s = first_ok_at - spawned_at
+        print(f"startup: import={import_s} ready={startup_s} first conversion={first_conversion_s} s", flush=True)
+        print(f"cold requests (ms): {cold_ms}", flush=True)
+        results = []
+        for endpoint in endpoints:
+            for corpus_name in corpus:
+                for concurrency in (int(level) for level in args.concurrency.split(",")):
+                    result = run_cell(driver, endpoint, corpus_name, concurrency, args.requests, args.warmup, sampler)
+                    results.append(result)
+                    latency = result["latency_ms"]
+                    print(
+                        f"{endpoint:14} {corpus_name:14} c={concurrency:<3} ok={result['ok']}/{result['requests']} "
+                        f"{result['throughput_rps']} req/s p50={latency['p50']} p95={latency['p95']} "
+                        f"p99={latency['p99']} ms rss={result['peak_rss_bytes']}",
+                        flush=True,
+                    )
+        if sampler:
+            sampler.stop()
+    finally:
+        stop_processes(processes)
+        workdir.cleanup()
+        if args.server_log:
+            log_file.close()
+
+    report = {
+        "started_at": started_at,
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "import_s": {"first": round(import_s[0], 3), "best": round(import_s[1], 3)} if import_s else None,
+        "server_startup_s": round(startup_s, 3) if startup_s is not None else None,
+        "time_to_first_conversion_s": round(first_conversion_s, 3) if first_conversion_s is not None else None,
+        "cold_request_ms": cold_ms,
+        "peak_rss_bytes": sampler.overall_peak if sampler else None,
+        "corpus": {name: {kind: len(data) for kind, data in docs.items()} for name, docs in corpus.items()},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
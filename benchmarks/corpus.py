@@ -0,0 +1,211 @@
+"""Synthetic DOCX/PDF corpus for the benchmarks: deterministic, stdlib only, in several sizes with and without images."""
+import io
+import random
+import struct
+import zipfile
+import zlib
+
+# Pages of text and number of embedded images per size
+SIZES = {
+    "small": {"pages": 1, "images": 1},
+    "medium": {"pages": 20, "images": 5},
+    "large": {"pages": 200, "images": 25},
+}
+PARAGRAPHS_PER_PAGE = 6
+WORDS_PER_PARAGRAPH = 60
+LINES_PER_PDF_PAGE = 45
+IMAGE_SIZE = 256  # Pixels per side; random pixels, so the PNG barely compresses (~190 KiB each)
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore et dolore "
+    "magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo "
+    "consequat duis aute irure in reprehenderit voluptate velit esse cillum fugiat nulla pariatur"
+).split()
+
+
+def _paragraphs(rng, count):
+    return [" ".join(rng.choice(WORDS) for _ in range(WORDS_PER_PARAGRAPH)).capitalize() + "." for _ in range(count)]
+
+
+def make_png(seed, size=IMAGE_SIZE):
+    rng = random.Random(seed)
+    raw = b"".join(b"\x00" + rng.randbytes(size * 3) for _ in range(size))  # Filter byte 0 before every row
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/docProps/app.xml" ContentType="application/vnd.openxmlformats-officedocument.extended-properties+xml"/>'
+    '</Types>'
+)
+PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/extended-properties" '
+    'Target="docProps/app.xml"/>'
+    '</Relationships>'
+)
+IMAGE_RUN = (
+    '<w:p><w:r><w:drawing><wp:inline distT="0" distB="0" distL="0" distR="0">'
+    '<wp:extent cx="1905000" cy="1905000"/><wp:docPr id="{n}" name="Picture {n}"/>'
+    '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+    '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+    '<pic:nvPicPr><pic:cNvPr id="{n}" name="image{n}.png"/><pic:cNvPicPr/></pic:nvPicPr>'
+    '<pic:blipFill><a:blip r:embed="rIdImage{n}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+    '<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="1905000" cy="1905000"/></a:xfrm>'
+    '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr>'
+    '</pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p>'
+)
+
+
+def make_docx(pages, images, seed=0):
+    rng = random.Random(seed)
+    paragraphs = _paragraphs(rng, pages * PARAGRAPHS_PER_PAGE)
+    # Spread the images evenly through the text
+    image_after = {(i + 1) * len(paragraphs) // (images + 1): i + 1 for i in range(images)}
+    body = []
+    for index, text in enumerate(paragraphs):
+        body.append(f'<w:p><w:r><w:t xml:space="preserve">{text}</w:t></w:r></w:p>')
+        if index in image_after:
+            body.append(IMAGE_RUN.format(n=image_after[index]))
+        if (index + 1) % PARAGRAPHS_PER_PAGE == 0:
+            body.append('<w:p><w:r><w:br w:type="page"/></w:r></w:p>')
+    document = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+        'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing">'
+        f'<w:body>{"".join(body)}</w:body></w:document>'
+    )
+    document_rels = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        + "".join(
+            f'<Relationship Id="rIdImage{n}" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image" '
+            f'Target="media/image{n}.png"/>'
+            for n in range(1, images + 1)
+        )
+        + '</Relationships>'
+    )
+    app_props = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties">'
+        f'<Pages>{pages}</Pages></Properties>'
+    )
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr("[Content_Types].xml", CONTENT_TYPES)
+        docx.writestr("_rels/.rels", PACKAGE_RELS)
+        docx.writestr("docProps/app.xml", app_props)
+        docx.writestr("word/document.xml", document)
+        docx.writestr("word/_rels/document.xml.rels", document_rels)
+        for n in range(1, images + 1):
+            docx.writestr(f"word/media/image{n}.png", make_png(seed * 1000 + n), compress_type=zipfile.ZIP_STORED)
+    return buffer.getvalue()
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages, images, seed=0):
+    rng = random.Random(seed)
+    objects = {}  # object number -> body bytes
+    objects[3] = b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+
+    image_numbers = []
+    for n in range(images):
+        pixels = make_png(seed * 1000 + n + 1)
+        # Reuse the PNG's pixel data as an RGB image XObject with the PNG predictor
+        idat = pixels[pixels.index(b"IDAT") + 4:pixels.index(b"IEND") - 8]
+        number = 4 + n
+        objects[number] = (
+            f"<< /Type /XObject /Subtype /Image /Width {IMAGE_SIZE} /Height {IMAGE_SIZE} /ColorSpace /DeviceRGB "
+            f"/BitsPerComponent 8 /Filter /FlateDecode /DecodeParms << /Predictor 15 /Colors 3 /Columns {IMAGE_SIZE} >> "
+            f"/Length {len(idat)} >>\nstream\n"
+        ).encode("ascii") + idat + b"\nendstream"
+        image_numbers.append(number)
+    # Spread the images over the pages
+    images_on_page = {}
+    for n, number in enumerate(image_numbers):
+        images_on_page.setdefault(n * pages // max(images, 1), []).append(number)
+
+    page_numbers = []
+    next_number = 4 + images
+    for page in range(pages):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(LINES_PER_PDF_PAGE)]
+        content = "BT /F1 11 Tf 14 TL 72 770 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        xobjects = images_on_page.get(page, [])
+        for slot, number in enumerate(xobjects):
+            content += f" q 180 0 0 180 {72 + (slot % 2) * 220} {80 + (slot // 2) * 200} cm /Im{number} Do Q"
+        content = content.encode("latin-1")
+        page_number, content_number = next_number, next_number + 1
+        next_number += 2
+        resources = "/Font << /F1 3 0 R >>"
+        if xobjects:
+            resources += " /XObject << " + " ".join(f"/Im{n} {n} 0 R" for n in xobjects) + " >>"
+        objects[page_number] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << {resources} >> "
+            f"/Contents {content_number} 0 R >>"
+        ).encode("ascii")
+        objects[content_number] = f"<< /Length {len(content)} >>\nstream\n".encode("ascii") + content + b"\nendstream"
+        page_numbers.append(page_number)
+
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[2] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{n} 0 R' for n in page_numbers)}] /Count {pages} >>"
+    ).encode("ascii")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = out.tell()
+        out.write(f"{number} 0 obj\n".encode("ascii") + objects[number] + b"\nendobj\n")
+    xref = out.tell()
+    count = max(objects) + 1
+    out.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode("ascii"))
+    for number in range(1, count):
+        out.write(f"{offsets[number]:010d} 00000 n \n".encode("ascii"))
+    out.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii"))
+    return out.getvalue()
+
+
+def build_corpus(sizes=tuple(SIZES), with_images=(False, True)):
+    """Return {name: {"docx": bytes, "pdf": bytes}}, e.g. "medium-images" or "small-text"."""
+    corpus = {}
+    for seed, size in enumerate(sizes):
+        spec = SIZES[size]
+        for images in with_images:
+            name = f"{size}-{'images' if images else 'text'}"
+            count = spec["images"] if images else 0
+            corpus[name] = {
+                "docx": make_docx(spec["pages"], count, seed=seed),
+                "pdf": make_pdf(spec["pages"], count, seed=seed),
+            }
+    return corpus
+
+
+def make_unique(kind, data, tag):
+    # Give every upload distinct bytes so the result cache does not answer instead of the converter
+    tag = tag.encode("ascii")
+    if kind == "docx":
+        # The corpus writes no ZIP comment: set the end-of-central-directory comment length and append one
+        return data[:-2] + struct.pack("<H", len(tag)) + tag
+    return data + b"% " + tag + b"\n"
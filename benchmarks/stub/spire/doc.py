@@ -0,0 +1,45 @@
+"""Benchmark stand-in for the parts of Spire.Doc used by the v2 endpoint."""
+import shutil
+
+
+class CssStyleSheetType:
+    Internal = "internal"
+
+
+class FileFormat:
+    Html = "html"
+
+
+class HtmlExportOptions:
+    IsExportDocumentStyles = False
+    CssStyleSheetType = None
+    ImageEmbedded = False
+    IsTextInputFormFieldAsText = False
+
+
+class Document:
+    def __init__(self):
+        self.HtmlExportOptions = HtmlExportOptions()
+        self._path = None
+
+    def LoadFromFile(self, path):
+        self._path = path
+
+    def SaveToFile(self, path, file_format):
+        # Output as large as the input, with the evaluation warning the server strips
+        with open(path, "w", encoding="utf-8") as out, open(self._path, "rb") as src:
+            out.write('<html><body><span style="color:#ff0000">Evaluation Warning: The document was created '
+                      'with Spire.Doc for Python.</span><pre>')
+            shutil.copyfileobj(src, _HexWriter(out))
+            out.write("</pre></body></html>")
+
+    def Dispose(self):
+        self._path = None
+
+
+class _HexWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, data):
+        self.out.write(data.hex())
@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+# Point the shared clients at an in-memory server before any app module binds them
+import redis_conn  # noqa: E402
+
+fake_server = fakeredis.FakeServer()
+redis_conn.redis_client = fakeredis.FakeRedis(server=fake_server, decode_responses=True)
+redis_conn.redis_binary_client = fakeredis.FakeRedis(server=fake_server)
+
+
+@pytest.fixture(autouse=True)
+def clean_redis(tmp_path, monkeypatch):
+    redis_conn.redis_client.flushall()
+    monkeypatch.chdir(tmp_path)
+    yield
+    redis_conn.redis_client.flushall()
@@ -0,0 +1,188 @@
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import job_worker
+import jobs
+from jobs import (JOB_MAX_ATTEMPTS, JOB_QUEUE_KEY, dequeue_job, enqueue_job, finish_job, get_job, processing_key,
+                  reclaim_jobs, redis_client, update_job, worker_heartbeat, worker_key)
+from libreoffice_pool import ConversionError
+
+
+def docx_bytes():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", "<w:document/>")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS_DIR", tmp_path / "jobs")
+    app = FastAPI()
+    app.include_router(jobs.jobs_router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def converter(monkeypatch):
+    # Stands in for LibreOffice: writes a PDF next to the input, or raises the exception set on it
+    calls = []
+
+    def convert(input_path, output_dir, convert_to):
+        calls.append(input_path)
+        if converter.error:
+            raise converter.error
+        result = output_dir / f"{input_path.stem}.pdf"
+        result.write_bytes(b"%PDF-1.4 converted")
+        return result
+
+    converter.error = None
+    converter.calls = calls
+    monkeypatch.setattr(job_worker.lo_pool, "convert", convert)
+    return converter
+
+
+def submit(client, name="report.docx"):
+    response = client.post("/api/v1/jobs/", files={"file": (name, docx_bytes())}, data={"target_format": "pdf"})
+    assert response.status_code == 202
+    return response.json()["job_id"]
+
+
+def test_submit_queues_the_job(client):
+    job_id = submit(client)
+
+    status = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert status["state"] == "queued"
+    assert status["queue_length"] == 1
+    assert redis_client.lrange(JOB_QUEUE_KEY, 0, -1) == [job_id]
+
+
+def test_submit_rejects_unknown_target(client):
+    response = client.post("/api/v1/jobs/", files={"file": ("a.docx", docx_bytes())}, data={"target_format": "xlsx"})
+    assert response.status_code == 400
+
+
+def test_unknown_job_is_404(client):
+    assert client.get("/api/v1/jobs/missing").status_code == 404
+    assert client.get("/api/v1/jobs/missing/result").status_code == 404
+
+
+def test_result_once_done(client, converter):
+    job_id = submit(client)
+    assert client.get(f"/api/v1/jobs/{job_id}/result").status_code == 409
+
+    assert dequeue_job("w1", timeout=1) == job_id
+    job_worker.run_job(job_id)
+    finish_job("w1", job_id)
+
+    status = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert status["state"] == "done"
+    assert status["progress"] == 100
+    result = client.get(status["result_url"])
+    assert result.status_code == 200
+    assert result.content == b"%PDF-1.4 converted"
+    assert "report.pdf" in result.headers["content-disposition"]
+    assert redis_client.llen(processing_key("w1")) == 0
+
+
+def test_failed_job(client, converter):
+    converter.error = ConversionError("LibreOffice could not read the document")
+    job_id = submit(client)
+
+    job_worker.run_job(dequeue_job("w1", timeout=1))
+
+    status = client.get(f"/api/v1/jobs/{job_id}").json()
+    assert status["state"] == "failed"
+    assert "could not read" in status["error"]
+    assert client.get(f"/api/v1/jobs/{job_id}/result").status_code == 409
+
+
+def test_expired_result_is_410(client, converter):
+    job_id = submit(client)
+    job_worker.run_job(dequeue_job("w1", timeout=1))
+    Path(get_job(job_id)["result_path"]).unlink()
+
+    assert client.get(f"/api/v1/jobs/{job_id}/result").status_code == 410
+
+
+def test_worker_loop_runs_jobs_until_stopped(client, converter, monkeypatch):
+    first, second = submit(client, "a.docx"), submit(client, "b.docx")
+    monkeypatch.setattr(job_worker, "JOB_WORKER_NAME", "loop-worker")
+    monkeypatch.setattr(job_worker, "stopping", False)
+    monkeypatch.setattr(job_worker, "reap_orphans", lambda root: None)
+    monkeypatch.setattr(job_worker.lo_pool, "start", lambda: None)
+    monkeypatch.setattr(job_worker.lo_pool, "shutdown", lambda: None)
+    monkeypatch.setattr(job_worker.signal, "signal", lambda signum, handler: None)
+    run_job = job_worker.run_job
+
+    def run_then_stop(job_id):
+        run_job(job_id)
+        if len(converter.calls) == 2:
+            job_worker.stopping = True
+
+    monkeypatch.setattr(job_worker, "run_job", run_then_stop)
+    job_worker.main()
+
+    assert [get_job(job_id)["state"] for job_id in (first, second)] == ["done", "done"]
+    assert get_job(first)["worker"] == "loop-worker"
+    assert redis_client.llen(processing_key("loop-worker")) == 0
+    assert not redis_client.exists(worker_key("loop-worker"))  # Unregistered on a clean stop
+
+
+def test_live_worker_keeps_its_job():
+    enqueue_job("j1", "in.docx", "in.docx", "docx", "pdf")
+    worker_heartbeat("w1")
+    dequeue_job("w1", timeout=1)
+    update_job("j1", state="running", attempts=1)
+
+    assert reclaim_jobs() == []
+    assert get_job("j1")["state"] == "running"
+
+
+def test_job_of_dead_worker_is_queued_again():
+    enqueue_job("j1", "in.docx", "in.docx", "docx", "pdf")
+    enqueue_job("j2", "in.docx", "in.docx", "docx", "pdf")
+    dequeue_job("dead", timeout=1)  # No heartbeat: the worker is gone
+    update_job("j1", state="running", attempts=1)
+
+    assert reclaim_jobs() == ["j1"]
+    assert get_job("j1")["state"] == "queued"
+    assert redis_client.llen(processing_key("dead")) == 0
+    assert dequeue_job("w2", timeout=1) == "j1"  # Ahead of the jobs that never started
+
+
+def test_restarted_worker_reclaims_its_own_job():
+    enqueue_job("j1", "in.docx", "in.docx", "docx", "pdf")
+    worker_heartbeat("w1")
+    dequeue_job("w1", timeout=1)
+
+    assert reclaim_jobs(restarted_worker="w1") == ["j1"]
+    assert redis_client.lrange(JOB_QUEUE_KEY, 0, -1) == ["j1"]
+
+
+def test_job_fails_after_max_attempts():
+    enqueue_job("j1", "in.docx", "in.docx", "docx", "pdf")
+    for attempt in range(1, JOB_MAX_ATTEMPTS + 1):
+        assert dequeue_job("dead", timeout=1) == "j1"
+        update_job("j1", state="running", attempts=attempt)
+        reclaim_jobs()
+
+    job = get_job("j1")
+    assert job["state"] == "failed"
+    assert "stopped" in job["error"]
+    assert redis_client.llen(JOB_QUEUE_KEY) == 0
+
+
+def test_finished_job_is_not_run_again():
+    enqueue_job("j1", "in.docx", "in.docx", "docx", "pdf")
+    dequeue_job("dead", timeout=1)
+    update_job("j1", state="done", progress=100)
+
+    reclaim_jobs()
+    assert redis_client.llen(JOB_QUEUE_KEY) == 0
+    assert redis_client.llen(processing_key("dead")) == 0
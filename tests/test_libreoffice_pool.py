@@ -0,0 +1,118 @@
+import sys
+import types
+
+import pytest
+
+import libreoffice_pool
+from libreoffice_pool import ConversionError, ConverterCrashed, ConverterUnavailable, LibreOfficePool
+
+RealWorker = libreoffice_pool.LibreOfficeWorker
+
+
+class FakeWorker:
+    fail_at = None
+    running = []
+
+    def __init__(self, index):
+        self.index = index
+        self.profile_dir = libreoffice_pool.LIBREOFFICE_PROFILE_ROOT / f"fake_{index}"
+
+    def start(self):
+        if self.index == FakeWorker.fail_at:
+            raise ConversionError(f"LibreOffice worker {self.index} did not start in time")
+        FakeWorker.running.append(self.index)
+
+    def stop(self):
+        FakeWorker.running.remove(self.index)
+
+
+@pytest.fixture(autouse=True)
+def fake_workers(monkeypatch):
+    monkeypatch.setitem(sys.modules, "uno", types.ModuleType("uno"))
+    monkeypatch.setattr(libreoffice_pool, "LibreOfficeWorker", FakeWorker)
+    FakeWorker.fail_at, FakeWorker.running = None, []
+
+
+def test_start_is_all_or_nothing():
+    pool = LibreOfficePool(size=3)
+    FakeWorker.fail_at = 2
+    with pytest.raises(ConversionError):
+        pool.start()
+
+    assert FakeWorker.running == []
+    assert pool.idle_workers == 0
+
+    FakeWorker.fail_at = None
+    pool.start()
+    assert FakeWorker.running == [0, 1, 2]
+    assert pool.idle_workers == 3
+    pool.shutdown()
+    assert FakeWorker.running == []
+
+
+@pytest.fixture
+def real_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(libreoffice_pool, "LibreOfficeWorker", RealWorker)
+    monkeypatch.setattr(libreoffice_pool, "LIBREOFFICE_PROFILE_ROOT", tmp_path / "profiles")
+
+
+def test_missing_soffice_is_a_crash(real_workers, monkeypatch):
+    monkeypatch.setattr(libreoffice_pool, "LIBREOFFICE_BINARY", "/nonexistent/soffice")
+    pool = LibreOfficePool(size=2)
+
+    with pytest.raises(ConverterCrashed):
+        pool.convert("in.docx", "out", "pdf")
+    assert pool.idle_workers == 0
+
+
+def test_missing_uno_module_is_a_crash(real_workers, monkeypatch):
+    monkeypatch.setattr(libreoffice_pool, "LIBREOFFICE_BINARY", "true")
+    monkeypatch.setitem(sys.modules, "uno", None)  # import uno raises ImportError
+    worker = RealWorker(0)
+
+    with pytest.raises(ConverterCrashed):
+        worker.start()
+    assert worker.process is None
+
+
+def test_pool_without_uno_converts_cold(monkeypatch):
+    monkeypatch.setitem(sys.modules, "uno", None)
+    cold_runs = []
+    monkeypatch.setattr(LibreOfficePool, "_convert_cold", staticmethod(lambda *args: cold_runs.append(args) or "out.pdf"))
+    pool = LibreOfficePool(size=2)
+
+    assert not pool.enabled
+    assert pool.convert("in.docx", "out", "pdf") == "out.pdf"
+    assert FakeWorker.running == [] and len(cold_runs) == 1
+
+
+def test_acquire_timeout_is_unavailable(monkeypatch):
+    monkeypatch.setattr(libreoffice_pool, "LIBREOFFICE_ACQUIRE_TIMEOUT", 0.1)
+    pool = LibreOfficePool(size=1)
+    pool.start()
+    pool._idle.get()  # The only worker is busy
+
+    with pytest.raises(ConverterUnavailable):
+        with pool._borrow():
+            pass
+    pool.shutdown()
+
+
+@pytest.mark.parametrize("version", [(7, 3), (7, 6), None])
+def test_cold_page_range_export(tmp_path, monkeypatch, version):
+    import PyPDF2
+
+    def run_cold(command, timeout):
+        # Stands in for soffice: a full export unless it honours the JSON page range
+        writer = PyPDF2.PdfWriter()
+        for _ in range(2 if "PageRange" in command[3] else 4):
+            writer.add_blank_page(width=72, height=72)
+        with open(tmp_path / "in.pdf", "wb") as out:
+            writer.write(out)
+
+    monkeypatch.setattr(libreoffice_pool, "cold_libreoffice_version", lambda: version)
+    monkeypatch.setattr(LibreOfficePool, "_run_cold", staticmethod(run_cold))
+    out_path = LibreOfficePool._convert_cold(tmp_path / "in.docx", tmp_path, libreoffice_pool.pdf_page_range_spec("2-3"))
+
+    assert len(PyPDF2.PdfReader(str(out_path)).pages) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["in.pdf"]
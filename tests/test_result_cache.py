@@ -0,0 +1,43 @@
+from result_cache import ResultCache
+
+
+def store(cache, tmp_path, key, size):
+    source = tmp_path / f"{key}-source"
+    source.mkdir()
+    output = source / "out.pdf"
+    output.write_bytes(b"x" * size)
+    return cache.put(key, [output])
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=250)
+    store(cache, tmp_path, "a", 100)
+    store(cache, tmp_path, "b", 100)
+    cache.get("a")
+    store(cache, tmp_path, "c", 100)
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+
+
+def test_pinned_entry_outlives_eviction_until_unpinned(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=150)
+    store(cache, tmp_path, "a", 100)
+    files = cache.get("a", pin=True)
+    store(cache, tmp_path, "b", 100)
+
+    assert files[0].read_bytes() == b"x" * 100  # Still readable by the response holding the pin
+    assert cache.stats()["bytes"] == 200  # Over the limit while pinned
+
+    cache.unpin("a")
+    assert not files[0].exists()
+    assert cache.stats()["bytes"] == 100
+
+
+def test_new_entry_is_kept_when_the_others_are_pinned(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=150)
+    store(cache, tmp_path, "a", 100)
+    cache.get("a", pin=True)
+
+    files = store(cache, tmp_path, "b", 100)
+    assert files[0].exists()
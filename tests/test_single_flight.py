@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import single_flight
+from libreoffice_pool import ConverterCrashed, ConverterUnavailable
+from redis_conn import redis_binary_client
+from result_cache import ResultCache
+from single_flight import SingleFlight
+from workspaces import WorkspaceManager
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path / "cache")
+    monkeypatch.setattr(single_flight, "result_cache", cache)
+    monkeypatch.setattr(single_flight, "workspaces", WorkspaceManager(tmp_path / "uploads", tmpfs_root=None))
+    return cache
+
+
+@pytest.fixture
+def flights():
+    # Two coordinators on one Redis, as in two gunicorn workers
+    return SingleFlight(redis_binary_client, lock_ttl=1.5), SingleFlight(redis_binary_client, lock_ttl=1.5)
+
+
+def producer(cache, tmp_path, runs, name, delay=0.3, error=None):
+    async def produce():
+        runs.append(name)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        output = tmp_path / f"{name}-output"
+        output.mkdir()
+        result = output / "out.pdf"
+        result.write_bytes(f"PDF from {name}".encode())
+        return cache.put("key", [result])
+    return produce
+
+
+async def later(coroutine, delay=0.05):
+    await asyncio.sleep(delay)
+    return await coroutine
+
+
+def run(*coroutines):
+    async def gather():
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+    return asyncio.run(gather())
+
+
+def test_same_process_requests_share_one_conversion(cache, tmp_path, flights):
+    runs = []
+    flight, _ = flights
+    results = run(*(flight.run("key", producer(cache, tmp_path, runs, f"r{i}")) for i in range(4)))
+
+    assert runs == ["r0"]
+    assert [files[0].read_bytes() for files in results] == [b"PDF from r0"] * 4
+
+
+def test_result_is_handed_off_to_a_waiting_process(cache, tmp_path, flights):
+    runs = []
+    owner, waiter = flights
+    results = run(owner.run("key", producer(cache, tmp_path, runs, "owner")),
+                  later(waiter.run("key", producer(cache, tmp_path, runs, "waiter"))))
+
+    assert runs == ["owner"]
+    assert [files[0].read_bytes() for files in results] == [b"PDF from owner"] * 2
+    assert not redis_binary_client.exists(owner._lock_key("key"))
+
+
+def test_no_handoff_without_waiters(cache, tmp_path, flights):
+    runs = []
+    owner, _ = flights
+    run(owner.run("key", producer(cache, tmp_path, runs, "owner")))
+
+    assert not redis_binary_client.exists(owner._result_key("key"))
+    assert not redis_binary_client.exists(owner._lock_key("key"))
+
+
+def test_document_failure_is_shared(cache, tmp_path, flights):
+    runs = []
+    owner, waiter = flights
+    error = HTTPException(status_code=504, detail="Conversion timed out")
+    results = run(owner.run("key", producer(cache, tmp_path, runs, "owner", error=error)),
+                  later(waiter.run("key", producer(cache, tmp_path, runs, "waiter"))))
+
+    assert runs == ["owner"]
+    assert [(e.status_code, e.detail) for e in results] == [(504, "Conversion timed out")] * 2
+
+
+@pytest.mark.parametrize("error", [
+    ConverterCrashed("soffice died"),
+    ConverterUnavailable("No LibreOffice worker became available in time"),
+    HTTPException(status_code=429, detail="busy"),
+])
+def test_waiter_takes_over_from_owner_specific_failure(cache, tmp_path, flights, error):
+    runs = []
+    owner, waiter = flights
+    results = run(owner.run("key", producer(cache, tmp_path, runs, "owner", error=error)),
+                  later(waiter.run("key", producer(cache, tmp_path, runs, "waiter"))))
+
+    assert runs == ["owner", "waiter"]
+    assert results[0] is error
+    assert results[1][0].read_bytes() == b"PDF from waiter"
+
+
+def test_waiter_takes_over_from_dead_owner(cache, tmp_path, flights):
+    runs = []
+    _, waiter = flights
+    redis_binary_client.set(waiter._lock_key("key"), "dead-owner", px=500)  # Nobody extends it
+
+    files = asyncio.run(waiter.run("key", producer(cache, tmp_path, runs, "waiter", delay=0)))
+
+    assert runs == ["waiter"]
+    assert files[0].read_bytes() == b"PDF from waiter"
+
+
+def test_heartbeat_keeps_a_long_conversion_owned(cache, tmp_path, flights):
+    runs = []
+    owner, waiter = flights
+    results = run(owner.run("key", producer(cache, tmp_path, runs, "owner", delay=2.5)),
+                  later(waiter.run("key", producer(cache, tmp_path, runs, "waiter"))))
+
+    assert runs == ["owner"]
+    assert results[1][0].read_bytes() == b"PDF from owner"
+
+
+def test_uncached_result_is_not_shared_in_process(tmp_path, monkeypatch, flights):
+    cache = ResultCache(tmp_path / "cache", max_bytes=4)  # Every output is too large for it
+    monkeypatch.setattr(single_flight, "result_cache", cache)
+    runs = []
+    flight, _ = flights
+    results = run(flight.run("key", producer(cache, tmp_path, runs, "first")),
+                  flight.run("key", producer(cache, tmp_path, runs, "second")))
+
+    assert runs == ["first", "second"]
+    assert [files[0].read_bytes() for files in results] == [b"PDF from first", b"PDF from second"]
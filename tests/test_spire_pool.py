@@ -0,0 +1,52 @@
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from libreoffice_pool import ConverterCrashed
+from spire_pool import SpirePool
+
+
+class FakeExecutor:
+    """Stands in for a process pool: each submit() pops the next outcome, a result or an exception."""
+
+    def __init__(self, outcomes, on_submit=None):
+        self.outcomes = outcomes
+        self.on_submit = on_submit
+        self._processes = {}
+
+    def submit(self, fn, *args):
+        if self.on_submit:
+            self.on_submit()
+        future = Future()
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            future.set_exception(outcome)
+        else:
+            future.set_result(outcome)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def test_worker_crash_is_reported_once():
+    pool = SpirePool(size=2)
+    pool._executor = FakeExecutor([BrokenProcessPool("worker died")])
+
+    with pytest.raises(ConverterCrashed):
+        pool.convert_docx_to_html("a.docx")
+    assert pool._executor is None
+
+
+def test_job_broken_by_another_jobs_failure_runs_again(monkeypatch):
+    pool = SpirePool(size=2)
+    replacement = FakeExecutor([1234, "a.html"])  # start() first submits a warm-up call
+    monkeypatch.setattr(pool, "_create_executor", lambda: replacement)
+
+    def replaced_by_other_job():
+        pool._executor = None  # What another job's deadline kill does meanwhile
+
+    pool._executor = FakeExecutor([BrokenProcessPool("killed")], on_submit=replaced_by_other_job)
+
+    assert pool.convert_docx_to_html("a.docx") == "a.html"
@@ -0,0 +1,72 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from uploads import UploadSizeLimitMiddleware
+
+
+def make_client(received):
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=1024)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        received.append(len(await file.read()))
+        return {"size": received[-1]}
+
+    return TestClient(app)
+
+
+def multipart(size, boundary=b"limit-test"):
+    yield b"--" + boundary + b'\r\nContent-Disposition: form-data; name="file"; filename="a.docx"\r\n\r\n'
+    for _ in range(size // 16384):
+        yield b"x" * 16384
+    yield b"\r\n--" + boundary + b"--\r\n"
+
+
+def post_chunked(client, size):
+    # A generator body goes out chunked, without Content-Length
+    return client.post("/upload", content=multipart(size),
+                       headers={"Content-Type": "multipart/form-data; boundary=limit-test"})
+
+
+def test_declared_length_over_limit_is_rejected():
+    received = []
+    response = make_client(received).post("/upload", files={"file": ("a.docx", b"x" * 200 * 1024)})
+    assert response.status_code == 413
+    assert received == []
+
+
+def test_chunked_body_over_limit_is_rejected():
+    received = []
+    response = post_chunked(make_client(received), 512 * 1024)
+    assert response.status_code == 413
+    assert "maximum upload size" in response.json()["detail"]
+    assert received == []
+
+
+def test_chunked_body_under_limit_passes():
+    received = []
+    response = post_chunked(make_client(received), 0)
+    assert response.status_code == 200
+    assert received == [0]
+
+
+def test_path_limit_applies_to_its_route_only():
+    received = []
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_bytes=1024, path_limits={"/batch": 1024 * 1024})
+
+    @app.post("/batch")
+    async def batch(files: list[UploadFile] = File(...)):
+        received.extend([len(await f.read()) for f in files])
+        return {"files": len(received)}
+
+    client = TestClient(app)
+    files = [("files", (f"{i}.docx", b"x" * 40 * 1024)) for i in range(3)]
+    assert client.post("/batch", files=files).status_code == 200
+    assert received == [40 * 1024] * 3
+
+    big = [("files", (f"{i}.docx", b"x" * 400 * 1024)) for i in range(3)]
+    response = client.post("/batch", files=big)
+    assert response.status_code == 413
+    assert "1048576 bytes" in response.json()["detail"]
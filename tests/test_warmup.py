@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+import warmup
+from warmup import WarmUp
+from workspaces import WorkspaceManager
+
+
+@pytest.fixture(autouse=True)
+def fake_converters(tmp_path, monkeypatch):
+    def convert(src, outdir, convert_to):
+        if convert_to == "pdf" and fake_converters.pdf_fails:
+            raise RuntimeError("no PDF export")
+        result = outdir / f"{src.stem}.{convert_to.split(':')[0]}"
+        result.write_bytes(b"output")
+        return result
+
+    fake_converters.pdf_fails = False
+    monkeypatch.setattr(warmup, "lo_pool", SimpleNamespace(start=lambda: None, convert=convert))
+    monkeypatch.setattr(warmup, "spire_pool", SimpleNamespace(start=lambda: None, convert_docx_to_html=lambda path: None))
+    monkeypatch.setattr(warmup, "pdf_text_engine", SimpleNamespace(start=lambda: None, convert=lambda pdf, out: None))
+    monkeypatch.setattr(warmup, "PDF2HTML_PIPELINE", SimpleNamespace(run=lambda targets, source, outdir: None))
+    monkeypatch.setattr(warmup, "write_sample_docx", lambda path: path.write_bytes(b"PK") and path)
+    monkeypatch.setattr(warmup, "workspaces", WorkspaceManager(tmp_path / "uploads", tmpfs_root=None))
+    return fake_converters
+
+
+def test_successful_warmup_is_healthy():
+    run = WarmUp(enabled=1)
+    run._run()
+
+    assert run.ready and run.healthy
+    assert run.failed == [] and run.skipped == []
+    assert "pdf2docx_text" in run.timings
+
+
+def test_steps_depending_on_a_failed_one_are_reported(fake_converters):
+    fake_converters.pdf_fails = True
+    run = WarmUp(enabled=1)
+    run._run()
+
+    assert run.ready and not run.healthy
+    assert run.failed == ["docx2pdf"]
+    assert run.skipped == ["pdf2docx", "pdf2html", "pdf2docx_text"]